@@ -3,14 +3,22 @@
 # =============================================================================
 # Takes the raw price data and works out what moved, by how much,
 # and whether it crossed your alert threshold.
+# When exchange rates are supplied, prices are first converted into
+# HOME_CURRENCY so each move includes the currency move.
 
-from config import ALERT_THRESHOLD_PCT
+from config import ALERT_THRESHOLD_PCT, HOME_CURRENCY
+from fx import rate_on
 
 
-def analyse(prices: dict):
+def analyse(prices: dict, fx_rates: dict = None):
     """
     Calculates % change for each ETF and categorises the results.
 
+    `fx_rates` is the {date: {currency: rate}} table from fx.get_rates().
+    If given, every non-home-currency ETF is converted at the rate for the
+    date of each close. ETFs without a rate for both dates are left in
+    their own currency.
+
     Returns a dict:
     {
         "movers": [list of ETFs that moved >= threshold, sorted biggest first],
@@ -22,14 +30,20 @@ def analyse(prices: dict):
     {
         "ticker": "VDE",
         "name": "Vanguard Energy Index",
-        "prev_close": 112.34,
-        "last_close": 115.67,
-        "pct_change": +2.96,
-        "currency": "USD",
-        "direction": "📈" or "📉"
+        "prev_close": 196.12,
+        "last_close": 203.05,
+        "pct_change": +3.53,
+        "currency": "NZD",
+        "direction": "📈" or "📉",
+        # Only present when the prices were converted:
+        "local_prev_close": 112.34,
+        "local_last_close": 115.67,
+        "local_pct_change": +2.96,
+        "local_currency": "USD",
     }
     """
     all_results = []
+    fx_dates = sorted(fx_rates) if fx_rates else []
 
     for ticker, data in prices.items():
         if data is None:
@@ -43,17 +57,38 @@ def analyse(prices: dict):
             continue  # Avoid division by zero
 
         pct_change = round(((last - prev) / prev) * 100, 2)
-        direction = "📈" if pct_change >= 0 else "📉"
-
-        all_results.append({
+        result = {
             "ticker": ticker,
             "name": data["name"],
             "prev_close": prev,
             "last_close": last,
             "pct_change": pct_change,
             "currency": data["currency"],
-            "direction": direction,
-        })
+        }
+
+        # Convert into home currency at each close's own date's rate
+        if fx_dates and data["currency"] != HOME_CURRENCY:
+            prev_rate = last_rate = None
+            if data.get("prev_date") and data.get("date"):
+                prev_rate = rate_on(fx_rates, data["currency"], data["prev_date"], fx_dates)
+                last_rate = rate_on(fx_rates, data["currency"], data["date"], fx_dates)
+
+            if prev_rate and last_rate:
+                home_prev = round(prev / prev_rate, 4)
+                home_last = round(last / last_rate, 4)
+                result.update({
+                    "prev_close": home_prev,
+                    "last_close": home_last,
+                    "pct_change": round(((home_last - home_prev) / home_prev) * 100, 2),
+                    "currency": HOME_CURRENCY,
+                    "local_prev_close": prev,
+                    "local_last_close": last,
+                    "local_pct_change": pct_change,
+                    "local_currency": data["currency"],
+                })
+
+        result["direction"] = "📈" if result["pct_change"] >= 0 else "📉"
+        all_results.append(result)
 
     # Sort all results by absolute % change — biggest movers first
     all_results.sort(key=lambda x: abs(x["pct_change"]), reverse=True)
@@ -71,9 +106,12 @@ def analyse(prices: dict):
 if __name__ == "__main__":
     # Quick test with dummy data
     dummy = {
-        "VDE": {"name": "Vanguard Energy", "prev_close": 100.0, "last_close": 104.5, "currency": "USD"},
+        "VDE": {"name": "Vanguard Energy", "prev_close": 100.0, "last_close": 104.5, "currency": "USD",
+                "prev_date": "2025-03-13", "date": "2025-03-14"},
         "GLD.NZ": {"name": "SmartShares Gold", "prev_close": 10.0, "last_close": 9.6, "currency": "NZD"},
     }
-    result = analyse(dummy)
+    # NZD weakened from 0.58 to 0.57 USD — adds to the USD gain for an NZ holder
+    dummy_rates = {"2025-03-13": {"USD": 0.58}, "2025-03-14": {"USD": 0.57}}
+    result = analyse(dummy, dummy_rates)
     print("Movers:", result["movers"])
     print("Has alert:", result["has_alert"])
@@ -2,21 +2,23 @@
 # CRYPTO TRACKER — ANALYSER
 # =============================================================================
 # Takes the raw crypto price data and works out what moved, by how much,
-# and whether it crossed the alert threshold.
-# Mirrors analyse.py but uses CRYPTO_ALERT_THRESHOLD_PCT.
+# and whether it crossed the alert threshold for any time horizon
+# (1h / 24h / 7d / 30d — see CRYPTO_HORIZON_THRESHOLDS).
+# Mirrors analyse.py, with one threshold per horizon instead of one overall.
 
-from config import CRYPTO_ALERT_THRESHOLD_PCT
+from config import CRYPTO_HORIZON_THRESHOLDS
 
 
 def analyse_crypto(prices: dict):
     """
-    Calculates % change for each coin and categorises the results.
+    Calculates % change for each coin over every configured horizon and
+    categorises the results.
 
     Returns a dict:
     {
-        "movers": [list of coins that moved >= threshold, sorted biggest first],
-        "all":    [all coins with their % change, sorted biggest move first],
-        "has_alert": True/False — whether anything hit the threshold
+        "movers": [list of coins that crossed any horizon's threshold, sorted biggest first],
+        "all":    [all coins with their % change, sorted biggest 24h move first],
+        "has_alert": True/False — whether anything hit a threshold
     }
 
     Each item in the lists looks like:
@@ -25,9 +27,13 @@ def analyse_crypto(prices: dict):
         "name": "Bitcoin (BTC)",
         "prev_close": 94200.00,
         "last_close": 97500.00,
-        "pct_change": +3.51,
+        "pct_change": +3.51,                  # 24h change
+        "changes": {"1h": 0.42, "24h": 3.51, "7d": 12.8, "30d": -2.4},
+        "triggers": ["7d"],                   # horizons that crossed their threshold
+        "lead": "7d",                         # triggered horizon furthest past its threshold
+        "volume_24h": 3.1e10,
         "currency": "USD",
-        "direction": "📈" or "📉"
+        "direction": "📈" or "📉"            # direction of the lead move
     }
     """
     all_results = []
@@ -43,7 +49,19 @@ def analyse_crypto(prices: dict):
             continue
 
         pct_change = round(((last - prev) / prev) * 100, 2)
-        direction = "📈" if pct_change >= 0 else "📉"
+
+        # Change over each horizon — 24h comes straight from the prices,
+        # the others from the provider. Horizons with no data are left out.
+        changes = {}
+        for horizon in CRYPTO_HORIZON_THRESHOLDS:
+            value = pct_change if horizon == "24h" else data.get(f"pct_change_{horizon}")
+            if value is not None:
+                changes[horizon] = round(value, 2)
+
+        triggers = [h for h, v in changes.items() if abs(v) >= CRYPTO_HORIZON_THRESHOLDS[h]]
+        lead = max(triggers, key=lambda h: abs(changes[h]) / CRYPTO_HORIZON_THRESHOLDS[h],
+                   default=None)
+        lead_change = changes[lead] if lead else pct_change
 
         all_results.append({
             "ticker": coin_id,
@@ -51,15 +69,22 @@ def analyse_crypto(prices: dict):
             "prev_close": prev,
             "last_close": last,
             "pct_change": pct_change,
+            "changes": changes,
+            "triggers": triggers,
+            "lead": lead,
+            "volume_24h": data.get("volume_24h"),
             "currency": data["currency"],
-            "direction": direction,
+            "direction": "📈" if lead_change >= 0 else "📉",
         })
 
-    # Sort by absolute % change — biggest movers first
+    # Sort by absolute 24h % change — biggest movers first
     all_results.sort(key=lambda x: abs(x["pct_change"]), reverse=True)
 
-    # Filter to only those that hit the alert threshold
-    movers = [r for r in all_results if abs(r["pct_change"]) >= CRYPTO_ALERT_THRESHOLD_PCT]
+    # Movers: crossed the threshold on at least one horizon, ordered by how
+    # far past its threshold the lead move went
+    movers = [r for r in all_results if r["triggers"]]
+    movers.sort(key=lambda x: abs(x["changes"][x["lead"]]) / CRYPTO_HORIZON_THRESHOLDS[x["lead"]],
+                reverse=True)
 
     return {
         "movers": movers,
@@ -70,10 +95,13 @@ def analyse_crypto(prices: dict):
 
 if __name__ == "__main__":
     dummy = {
-        "bitcoin":  {"name": "Bitcoin (BTC)",  "prev_close": 94000.0, "last_close": 99000.0, "currency": "USD"},
-        "ethereum": {"name": "Ethereum (ETH)", "prev_close": 3000.0,  "last_close": 2850.0,  "currency": "USD"},
-        "dogecoin": {"name": "Dogecoin (DOGE)","prev_close": 0.20,    "last_close": 0.204,   "currency": "USD"},
+        "bitcoin":  {"name": "Bitcoin (BTC)",  "prev_close": 94000.0, "last_close": 99000.0, "currency": "USD",
+                     "pct_change_1h": 0.4, "pct_change_7d": 6.0, "pct_change_30d": 9.0},
+        "ethereum": {"name": "Ethereum (ETH)", "prev_close": 3000.0,  "last_close": 2850.0,  "currency": "USD",
+                     "pct_change_1h": -0.2, "pct_change_7d": -14.5, "pct_change_30d": -20.0},
+        "dogecoin": {"name": "Dogecoin (DOGE)","prev_close": 0.20,    "last_close": 0.204,   "currency": "USD",
+                     "pct_change_1h": 0.1, "pct_change_7d": 1.0, "pct_change_30d": None},
     }
     result = analyse_crypto(dummy)
-    print("Movers:", result["movers"])
+    print("Movers:", [(m["ticker"], m["triggers"], m["changes"]) for m in result["movers"]])
     print("Has alert:", result["has_alert"])
@@ -1,37 +1,47 @@
 # =============================================================================
 # ETF TRACKER — P/E RATIO ANALYSER
 # =============================================================================
-# Takes the raw P/E data and classifies each ETF as above or below the
-# alert threshold. ETFs where P/E data wasn't available are tracked separately
-# so the notification can report them as skipped rather than silently dropped.
+# Takes the raw P/E data and classifies each ETF as expensive, cheap or in its
+# normal range. Where an ETF has enough stored history (see pe_history.py) it
+# is ranked against its own past P/E ratios; otherwise it falls back to the
+# single PE_ALERT_THRESHOLD. ETFs where P/E data wasn't available are tracked
+# separately so the notification can report them as skipped rather than
+# silently dropped.
 
-from config import PE_ALERT_THRESHOLD
+from config import PE_ALERT_THRESHOLD, PE_PERCENTILE_HIGH, PE_PERCENTILE_LOW
+from pe_history import percentile
 
 
-def analyse_pe(pe_data: dict):
+def analyse_pe(pe_data: dict, history: dict = None):
     """
-    Compares each ETF's P/E ratio against PE_ALERT_THRESHOLD.
+    Classifies each ETF's P/E ratio against its own history (top/bottom
+    decile by default), or against PE_ALERT_THRESHOLD if there isn't enough
+    history yet.
 
     Returns a dict:
     {
-        "above":   [ETFs with P/E > threshold, sorted highest first],
-        "below":   [ETFs with P/E < threshold, sorted lowest first],
-        "all":     [all ETFs with P/E data, sorted highest to lowest],
-        "skipped": [ticker strings where P/E data was unavailable],
+        "above":    [ETFs flagged expensive, sorted highest first],
+        "below":    [ETFs flagged cheap, sorted lowest first],
+        "in_range": [ETFs within their normal historical range],
+        "all":      [all ETFs with P/E data, sorted highest to lowest],
+        "skipped":  [ticker strings where P/E data was unavailable],
         "has_alert": True if any P/E data was retrieved, False otherwise
     }
 
-    Each item in above/below/all looks like:
+    Each item in above/below/in_range/all looks like:
     {
-        "ticker":   "VOO",
-        "name":     "S&P 500",
-        "pe_ratio": 26.5,
-        "is_above": True,
-        "direction": "🔴"   # 🔴 = above threshold, 🟢 = below threshold
+        "ticker":     "VOO",
+        "name":       "S&P 500",
+        "pe_ratio":   26.5,
+        "percentile": 94.0,      # rank within own history, None if too little
+        "is_above":   True,
+        "direction":  "🔴"       # 🔴 = expensive, 🟢 = cheap, 🟡 = normal range
     }
     """
+    history = history or {}
     above = []
     below = []
+    in_range = []
     all_results = []
     skipped = []
 
@@ -41,25 +51,37 @@ def analyse_pe(pe_data: dict):
             continue
 
         pe = data["pe_ratio"]
-        is_above = pe > PE_ALERT_THRESHOLD
+        pct = percentile(history, ticker, pe)
+
+        if pct is None:
+            # Not enough history — use the fixed threshold
+            is_above = pe > PE_ALERT_THRESHOLD
+            is_below = not is_above
+        else:
+            is_above = pct >= PE_PERCENTILE_HIGH
+            is_below = pct <= PE_PERCENTILE_LOW
 
         entry = {
             "ticker": ticker,
             "name": data["name"],
             "pe_ratio": pe,
+            "percentile": pct,
             "is_above": is_above,
-            "direction": "🔴" if is_above else "🟢",
+            "direction": "🔴" if is_above else "🟢" if is_below else "🟡",
         }
 
         all_results.append(entry)
         if is_above:
             above.append(entry)
-        else:
+        elif is_below:
             below.append(entry)
+        else:
+            in_range.append(entry)
 
     return {
         "above":     sorted(above, key=lambda x: x["pe_ratio"], reverse=True),
         "below":     sorted(below, key=lambda x: x["pe_ratio"]),
+        "in_range":  sorted(in_range, key=lambda x: x["pe_ratio"], reverse=True),
         "all":       sorted(all_results, key=lambda x: x["pe_ratio"], reverse=True),
         "skipped":   skipped,
         "has_alert": len(all_results) > 0,
@@ -75,8 +97,12 @@ if __name__ == "__main__":
         "EFA": {"name": "iShares MSCI EAFE",      "pe_ratio": 15.8},
         "GLD": None,  # commodity, no P/E
     }
-    result = analyse_pe(dummy)
-    print(f"Above threshold ({PE_ALERT_THRESHOLD}):", [(e["ticker"], e["pe_ratio"]) for e in result["above"]])
-    print(f"Below threshold ({PE_ALERT_THRESHOLD}):", [(e["ticker"], e["pe_ratio"]) for e in result["below"]])
+    # QQQ has a long history around 30–36, so 34.1 is normal for it
+    dummy_history = {"QQQ": {"values": [30.0, 31.2, 32.0, 32.5, 33.1, 33.8, 34.0, 34.6, 35.2, 36.0],
+                             "latest": 36.0, "last_date": "2025-01-10"}}
+    result = analyse_pe(dummy, dummy_history)
+    print("Expensive:", [(e["ticker"], e["pe_ratio"], e["percentile"]) for e in result["above"]])
+    print("Cheap:    ", [(e["ticker"], e["pe_ratio"], e["percentile"]) for e in result["below"]])
+    print("In range: ", [(e["ticker"], e["pe_ratio"], e["percentile"]) for e in result["in_range"]])
     print("Skipped:", result["skipped"])
     print("Has alert:", result["has_alert"])
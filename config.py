@@ -4,23 +4,142 @@
 # This is the main settings file. Edit this to change your watchlist,
 # notification threshold, or timing preferences.
 
+import json
 import os
 
 # --- Your Ntfy topic name ---
 # This is pulled from an environment variable (a GitHub Secret) so your
 # topic name is never visible in your code. You'll set this up in GitHub.
 NTFY_TOPIC = os.environ.get("NTFY_TOPIC", "your-topic-name-here")
-NTFY_URL = f"https://ntfy.sh/{NTFY_TOPIC}"
+NTFY_SERVER = "https://ntfy.sh"
+NTFY_URL = f"{NTFY_SERVER}/{NTFY_TOPIC}"
+
+# --- Alpha Vantage API keys ---
+# One key is enough for the default watchlist. To track more ETFs, add more
+# free keys as a comma-separated ALPHA_VANTAGE_KEYS secret — requests are
+# shared across them, so each extra key adds 25 requests/day and lets the
+# run go proportionally faster.
+ALPHA_VANTAGE_KEYS = [
+    k.strip()
+    for k in (os.environ.get("ALPHA_VANTAGE_KEYS") or os.environ.get("ALPHA_VANTAGE_KEY", "demo")).split(",")
+    if k.strip()
+]
+
+# Free tier limits, per key: 25 requests/day, 5 requests/minute (we pace
+# each key at one request every 13 seconds to stay safely under that).
+ALPHA_VANTAGE_DAILY_LIMIT = 25
+ALPHA_VANTAGE_SECONDS_BETWEEN_CALLS = 13
+
+# --- Other data providers ---
+# How often the other sources are called. providers.py uses these (with the
+# Alpha Vantage limits above) to plan each run's requests.
+YAHOO_SECONDS_BETWEEN_CALLS = 1        # P/E ratios, one ETF per request
+COINGECKO_SECONDS_BETWEEN_CALLS = 6    # free tier allows ~10 calls/min
+
+# --- Home currency ---
+# The currency your holdings are actually in. ETF prices are converted into it
+# (using that day's exchange rate) before working out the % move, so the alert
+# includes the currency move too. Set to "USD" to report raw US prices.
+HOME_CURRENCY = "NZD"
+
+# Exchange rates are fetched once and re-used for this many hours.
+FX_CACHE_TTL_HOURS = 12
 
 # --- Alert threshold ---
 # A notification will only be sent if at least one ETF moves by this amount.
 ALERT_THRESHOLD_PCT = 4.0
 
+# --- Saved state ---
+# Folder where the tracker keeps small files between runs (e.g. the rolling
+# correlation matrix). On GitHub Actions this folder is carried from one run
+# to the next with actions/cache — see the workflow files.
+STATE_DIR = os.environ.get("STATE_DIR", "state")
+
+# P/E history is written by the P/E report and read by the price report's
+# alert rules (pe_ratio / pe_percentile). The GitHub workflows keep it in
+# its own cache, shared by both, so it can be moved out of STATE_DIR.
+PE_HISTORY_FILE = os.environ.get("PE_HISTORY_FILE", os.path.join(STATE_DIR, "pe_history.json"))
+
+# --- Run snapshots ---
+# Each run saves what it fetched to a snapshot folder here, so the report can
+# be regenerated later with --from-snapshot (no network calls).
+# Only the newest SNAPSHOT_KEEP snapshots per pipeline are kept.
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_KEEP = 10
+
+# --- HTTP response cache ---
+# Responses are saved (in STATE_DIR) with their ETag / Last-Modified so an
+# unchanged one isn't downloaded again. Entries unused this long are removed.
+HTTP_CACHE_KEEP_DAYS = 30
+
+# --- Profiling (--profile) ---
+# Where per-stage CPU profiles and allocation summaries are written, and how
+# many of the biggest allocating source lines each summary lists.
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_TOP_ALLOCATIONS = 20
+
+# --- Sharded runs ---
+# Where each worker of a sharded run (--shard i/N) saves its partial results
+# for the merge step (--merge N) to pick up.
+SHARD_DIR = os.environ.get("SHARD_DIR", "shards")
+
+# Identifies one sharded run, so the merge never picks up a partial result
+# left over from an earlier run. On GitHub Actions every job of a workflow
+# run shares GITHUB_RUN_ID; elsewhere set SHARD_RUN_ID for each run, or the
+# trading session being fetched is used.
+SHARD_RUN_ID = os.environ.get("SHARD_RUN_ID") or os.environ.get("GITHUB_RUN_ID")
+
+# --- Correlation clustering ---
+# ETFs that normally move together (e.g. VOO, VT and VUG) are grouped into a
+# single line in the alert instead of being listed one by one.
+# Two ETFs are grouped when the correlation of their daily returns is at least
+# this value (1.0 = always move in lockstep, 0 = unrelated).
+CORRELATION_CLUSTER_THRESHOLD = 0.9
+
+# How quickly old days stop counting. After this many trading days a day's
+# return carries half the weight it had when it was added.
+CORRELATION_HALFLIFE_DAYS = 60
+
+# Don't trust a correlation until the pair has been seen on this many days.
+CORRELATION_MIN_OBSERVATIONS = 20
+
+# --- Custom alert rules ---
+# Extra alerts that combine price moves, P/E ratios and crypto changes.
+# Format: "Rule name": "condition". Conditions use the field names below with
+# <, <=, >, >=, ==, !=, and / or / not, + - * / and abs().
+#
+#   pct_change         today's % move (ETFs in HOME_CURRENCY, crypto over 24h)
+#   local_pct_change   ETF % move in USD
+#   last_close         latest price
+#   pe_ratio           ETF's latest P/E ratio (from the P/E tracker)
+#   pe_percentile      where that P/E sits in the ETF's own history (0–100)
+#   change_1h, change_24h, change_7d, change_30d   crypto % change per horizon
+#   volume_24h         crypto 24h trading volume, USD
+#   ticker             e.g. ticker in ("VOO", "VT")
+#
+# A rule only matches symbols that have every field it uses — a P/E rule never
+# fires for a coin. Rules are checked by main.py (ETFs) and main_crypto.py.
+# None are set by default; for example:
+#
+#   ALERT_RULES = {
+#       "Value dip": "pct_change <= -3 and pe_ratio < 20",
+#   }
+ALERT_RULES = {}
+
 # --- P/E ratio alert threshold ---
 # A notification is sent daily showing which ETFs are above or below this value.
 # Above = potentially expensive, below = potential buy opportunity.
 PE_ALERT_THRESHOLD = 23.0
 
+# --- P/E history ranking ---
+# Once an ETF has enough P/E history, it's ranked against its own past values
+# instead of PE_ALERT_THRESHOLD: the top 10% of its history is flagged as
+# expensive, the bottom 10% as a potential buy. Until then (a new ETF, or the
+# first few weeks of history) the fixed threshold above is used.
+PE_PERCENTILE_HIGH = 90
+PE_PERCENTILE_LOW = 10
+PE_MIN_HISTORY = 10
+
 # --- P/E watchlist ---
 # 20 ETFs rotated in groups of 3 by day-of-year. P/E data sourced from Yahoo Finance.
 PE_WATCHLIST = {
@@ -50,6 +169,17 @@ PE_WATCHLIST = {
 # A notification will only be sent if at least one coin moves by this amount.
 CRYPTO_ALERT_THRESHOLD_PCT = 5.0
 
+# --- Crypto alert thresholds per time horizon ---
+# Each coin's move is checked over several time spans at once; a coin is
+# alerted if it crosses the threshold for ANY of them.
+# Remove a horizon here to stop checking it. Supported: 1h, 24h, 7d, 14d, 30d, 200d, 1y.
+CRYPTO_HORIZON_THRESHOLDS = {
+    "1h":  3.0,
+    "24h": CRYPTO_ALERT_THRESHOLD_PCT,
+    "7d":  12.0,
+    "30d": 25.0,
+}
+
 # --- Crypto watchlist ---
 # Format: "COINGECKO_ID": "Friendly name"
 # CoinGecko IDs: https://www.coingecko.com/en/coins/all
@@ -96,3 +226,41 @@ WATCHLIST = {
     "IYH":  "iShares US Healthcare ETF",
     "XLY":  "Consumer Discretionary Select SPDR",
 }
+
+# --- Subscribers (price alerts) ---
+# Several people can get ETF price alerts from one run, each with their own
+# Ntfy topic, watchlist and threshold. Every ticker is still fetched only
+# once per run, however many people watch it.
+#
+# Set the SUBSCRIBERS_JSON secret to a JSON list (topics stay out of the code):
+#   [
+#     {"name": "john", "topic": "johns-etf-alerts-8472",
+#      "watchlist": ["VOO", "VT", "GLD"], "alert_threshold_pct": 3.0},
+#     {"name": "sam",  "topic": "sams-alerts-1234",
+#      "watchlist": {"VOO": "S&P 500", "SCHD": "Schwab US Dividend"},
+#      "rules": ["Value dip"]}
+#   ]
+# "watchlist" is a list of tickers from WATCHLIST, or a dict of extra
+# "TICKER": "Friendly name" entries (these are added to WATCHLIST below).
+# "name" defaults to the topic, "alert_threshold_pct" to ALERT_THRESHOLD_PCT
+# and "rules" (names from ALERT_RULES) to all of them. Entries are checked
+# when main.py starts (see subscribers.validate_subscribers).
+#
+# Without SUBSCRIBERS_JSON there is one subscriber: NTFY_TOPIC, watching
+# everything in WATCHLIST.
+try:
+    SUBSCRIBERS = json.loads(os.environ.get("SUBSCRIBERS_JSON") or "null") or [
+        {"name": "default", "topic": NTFY_TOPIC, "watchlist": list(WATCHLIST)},
+    ]
+except ValueError as e:
+    raise SystemExit(f"❌ SUBSCRIBERS_JSON is not valid JSON: {e}") from None
+
+# The run fetches the union of every subscriber's watchlist (malformed
+# entries are skipped here and reported by validate_subscribers)
+for _subscriber in SUBSCRIBERS if isinstance(SUBSCRIBERS, list) else []:
+    if not isinstance(_subscriber, dict) or not isinstance(_subscriber.get("watchlist", []), (list, dict)):
+        continue
+    _watchlist = _subscriber.get("watchlist", [])
+    _names = _watchlist if isinstance(_watchlist, dict) else dict.fromkeys(_watchlist)
+    for _ticker, _name in _names.items():
+        WATCHLIST.setdefault(_ticker, _name or _ticker)
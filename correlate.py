@@ -0,0 +1,212 @@
+# =============================================================================
+# ETF TRACKER — CORRELATION CLUSTERING
+# =============================================================================
+# Keeps a rolling covariance matrix of daily returns for every ETF we track,
+# and uses it to group movers that normally move together (VOO / VT / VUG,
+# GLD / AAAU / GLTR...) so the alert shows one line per group.
+#
+# The matrix is updated incrementally with each new daily bar — an
+# exponentially weighted covariance, so old days fade out on their own.
+# Each update costs O(n²) for n ETFs; we never go back over the full
+# price history. The matrix is saved to STATE_DIR between runs.
+
+import json
+import math
+import os
+from config import (
+    STATE_DIR,
+    CORRELATION_CLUSTER_THRESHOLD,
+    CORRELATION_HALFLIFE_DAYS,
+    CORRELATION_MIN_OBSERVATIONS,
+)
+
+STATE_FILE = os.path.join(STATE_DIR, "correlation.json")
+
+# Weight given to the newest day — derived from the half-life in config.py
+ALPHA = 1 - 0.5 ** (1 / CORRELATION_HALFLIFE_DAYS)
+
+
+def load_state(path: str = STATE_FILE) -> dict:
+    """
+    Loads the saved correlation state, or returns an empty one if there
+    isn't any yet (first run, or the cache was cleared).
+
+    The state is a plain dict:
+    {
+        "tickers":   ["VDE", "VOO", ...],   # row/column order of the matrices
+        "mean":      [0.0012, ...],         # rolling mean daily return
+        "cov":       [[...], ...],          # rolling covariance matrix
+        "count":     [[...], ...],          # days each pair has been seen together
+        "last_date": "2025-03-14",          # newest bar already included
+    }
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"tickers": [], "mean": [], "cov": [], "count": [], "last_date": None}
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Could not read {path} ({e}) — starting correlations from scratch")
+        return {"tickers": [], "mean": [], "cov": [], "count": [], "last_date": None}
+
+
+def save_state(state: dict, path: str = STATE_FILE):
+    """Writes the correlation state back to disk."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+
+def _add_ticker(state: dict, ticker: str, first_return: float) -> int:
+    """Grows the matrices by one row/column for a newly seen ticker."""
+    state["tickers"].append(ticker)
+    state["mean"].append(first_return)
+    for row in state["cov"]:
+        row.append(0.0)
+    for row in state["count"]:
+        row.append(0)
+    n = len(state["tickers"])
+    state["cov"].append([0.0] * n)
+    state["count"].append([0] * n)
+    return n - 1
+
+
+def update(state: dict, bar_date: str, returns: dict) -> bool:
+    """
+    Folds one day of returns into the rolling covariance matrix.
+
+    `returns` maps ticker -> that day's return (0.012 = +1.2%). Tickers
+    missing from it (e.g. failed to fetch) are simply left untouched.
+    A bar that is not newer than the last one included is ignored, so
+    running twice on the same day doesn't count that day twice.
+
+    Returns True if the state changed.
+    """
+    if not returns or (state["last_date"] and bar_date <= state["last_date"]):
+        return False
+
+    index = {t: i for i, t in enumerate(state["tickers"])}
+    present = []  # (matrix index, deviation from the old mean)
+
+    for ticker, r in returns.items():
+        if ticker not in index:
+            # First time we've seen it — its mean starts at today's return
+            # and it joins the covariance updates from the next bar on.
+            index[ticker] = _add_ticker(state, ticker, r)
+            continue
+        i = index[ticker]
+        present.append((i, r - state["mean"][i]))
+
+    mean, cov, count = state["mean"], state["cov"], state["count"]
+
+    for i, diff in present:
+        mean[i] += ALPHA * diff
+
+    for i, diff_i in present:
+        row_cov, row_count = cov[i], count[i]
+        for j, diff_j in present:
+            row_cov[j] = (1 - ALPHA) * (row_cov[j] + ALPHA * diff_i * diff_j)
+            row_count[j] += 1
+
+    state["last_date"] = bar_date
+    return True
+
+
+def update_from_prices(state: dict, prices: dict) -> bool:
+    """
+    Convenience wrapper around update() for the output of fetch_prices().
+    Only tickers whose latest bar is the newest date in the batch are used —
+    a ticker still showing yesterday's bar would add a stale return.
+    """
+    fetched = {t: d for t, d in prices.items() if d and d.get("date") and d["prev_close"]}
+    if not fetched:
+        return False
+
+    bar_date = max(d["date"] for d in fetched.values())
+    returns = {
+        t: d["last_close"] / d["prev_close"] - 1
+        for t, d in fetched.items()
+        if d["date"] == bar_date
+    }
+    return update(state, bar_date, returns)
+
+
+def correlation(state: dict, a: str, b: str):
+    """
+    Returns the rolling correlation between two tickers, or None if we
+    haven't seen them together on enough days to say.
+    """
+    tickers = state["tickers"]
+    if a not in tickers or b not in tickers:
+        return None
+
+    i, j = tickers.index(a), tickers.index(b)
+    if state["count"][i][j] < CORRELATION_MIN_OBSERVATIONS:
+        return None
+
+    var_i, var_j = state["cov"][i][i], state["cov"][j][j]
+    if var_i <= 0 or var_j <= 0:
+        return None
+
+    return state["cov"][i][j] / math.sqrt(var_i * var_j)
+
+
+def cluster_movers(state: dict, movers: list) -> list:
+    """
+    Groups movers that are highly correlated and moved in the same direction.
+
+    Takes the "movers" list from analyse() (already sorted biggest first) and
+    returns a list of clusters, each a list of movers — the first mover in
+    each cluster is its biggest move. A mover with no close relatives comes
+    back as a cluster of one.
+    """
+    # Union-find over the movers — pairs above the threshold share a root
+    parent = list(range(len(movers)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(movers)):
+        for j in range(i + 1, len(movers)):
+            a, b = movers[i], movers[j]
+            if (a["pct_change"] >= 0) != (b["pct_change"] >= 0):
+                continue
+            corr = correlation(state, a["ticker"], b["ticker"])
+            if corr is not None and corr >= CORRELATION_CLUSTER_THRESHOLD:
+                parent[find(j)] = find(i)
+
+    # Movers are visited in order, so each cluster keeps biggest-first order
+    # and clusters come out ordered by their biggest move.
+    clusters = {}
+    for i, mover in enumerate(movers):
+        clusters.setdefault(find(i), []).append(mover)
+
+    return list(clusters.values())
+
+
+if __name__ == "__main__":
+    # Quick test with dummy data — VOO and VT move together, GLD doesn't
+    import random
+
+    random.seed(1)
+    state = {"tickers": [], "mean": [], "cov": [], "count": [], "last_date": None}
+    for day in range(1, 61):
+        market = random.gauss(0, 0.01)
+        update(state, f"2025-{1 + day // 28:02d}-{1 + day % 28:02d}", {
+            "VOO": market + random.gauss(0, 0.001),
+            "VT":  market + random.gauss(0, 0.002),
+            "GLD": random.gauss(0, 0.01),
+        })
+
+    print("corr(VOO, VT): ", round(correlation(state, "VOO", "VT"), 3))
+    print("corr(VOO, GLD):", round(correlation(state, "VOO", "GLD"), 3))
+
+    movers = [
+        {"ticker": "VOO", "pct_change": 4.8},
+        {"ticker": "VT",  "pct_change": 4.2},
+        {"ticker": "GLD", "pct_change": 4.1},
+    ]
+    print("Clusters:", [[m["ticker"] for m in c] for c in cluster_movers(state, movers)])
@@ -0,0 +1,182 @@
+# =============================================================================
+# ETF TRACKER — RESPONSE DECODING
+# =============================================================================
+# Turns raw provider responses (bytes) straight into the few typed values
+# the fetchers use, and rejects anything malformed right here — rather than
+# building a full dict tree (100 days × 5 string fields per ETF) and
+# converting strings to floats one at a time afterwards.
+#
+# If the optional `msgspec` package is installed (pip install msgspec), it's
+# used as a fast, schema-checked decoder: only the fields we need are
+# materialised and prices are converted to floats while parsing. Without it,
+# the standard-library json module does the same job, just more slowly.
+
+import json
+from typing import NamedTuple, Optional
+
+try:
+    import msgspec
+except ImportError:  # optional — fall back to the json module
+    msgspec = None
+
+# Every change horizon CoinGecko's markets endpoint can return
+CRYPTO_HORIZONS = ("1h", "24h", "7d", "14d", "30d", "200d", "1y")
+
+
+class DecodeError(ValueError):
+    """A provider response didn't have the expected shape."""
+
+
+class DailySeries(NamedTuple):
+    """An Alpha Vantage TIME_SERIES_DAILY response."""
+    closes: list                 # [(date, close), ...] newest first
+    error: Optional[str]         # "Error Message" — e.g. unknown ticker
+    information: Optional[str]   # "Information" / "Note" — usually a rate limit
+
+
+class MarketRow(NamedTuple):
+    """One coin from a CoinGecko /coins/markets response."""
+    id: str
+    current_price: Optional[float]
+    price_change_24h: Optional[float]
+    total_volume: Optional[float]
+    changes: dict                # {"1h": 0.42, "7d": -3.1, ...} — None if not returned
+
+
+# -----------------------------------------------------------------------------
+# Fast path — msgspec schemas (only built if msgspec is installed)
+# -----------------------------------------------------------------------------
+
+if msgspec is not None:
+    class _Bar(msgspec.Struct):
+        close: float = msgspec.field(name="4. close")
+
+    class _Daily(msgspec.Struct):
+        series: Optional[dict[str, _Bar]] = msgspec.field(name="Time Series (Daily)", default=None)
+        error: Optional[str] = msgspec.field(name="Error Message", default=None)
+        information: Optional[str] = msgspec.field(name="Information", default=None)
+        note: Optional[str] = msgspec.field(name="Note", default=None)
+
+    # One optional float field per horizon, e.g. price_change_percentage_7d_in_currency
+    _Market = msgspec.defstruct("_Market", [
+        ("id", str),
+        ("current_price", Optional[float], None),
+        ("price_change_24h", Optional[float], None),
+        ("total_volume", Optional[float], None),
+    ] + [
+        (f"price_change_percentage_{h}_in_currency", Optional[float], None)
+        for h in CRYPTO_HORIZONS
+    ])
+
+    # strict=False lets Alpha Vantage's quoted numbers ("512.3400") decode as floats
+    _daily_decoder = msgspec.json.Decoder(_Daily, strict=False)
+    _markets_decoder = msgspec.json.Decoder(list[_Market])
+
+
+def _float(value, what: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise DecodeError(f"{what} is not a number: {value!r}") from None
+
+
+def _optional_float(row: dict, field: str):
+    value = row.get(field)
+    return None if value is None else _float(value, field)
+
+
+def decode_daily_series(raw: bytes) -> DailySeries:
+    """
+    Decodes an Alpha Vantage TIME_SERIES_DAILY response.
+    Raises DecodeError if it isn't the expected shape.
+    """
+    if msgspec is not None:
+        try:
+            data = _daily_decoder.decode(raw)
+        except (msgspec.DecodeError, msgspec.ValidationError) as e:
+            raise DecodeError(f"Malformed Alpha Vantage response: {e}") from None
+        closes = [(day, bar.close) for day, bar in (data.series or {}).items()]
+        error, information = data.error, data.information or data.note
+    else:
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            raise DecodeError(f"Malformed Alpha Vantage response: {e}") from None
+        if not isinstance(data, dict):
+            raise DecodeError("Malformed Alpha Vantage response: expected an object")
+
+        series = data.get("Time Series (Daily)") or {}
+        if not isinstance(series, dict):
+            raise DecodeError("Malformed Alpha Vantage response: time series is not an object")
+        try:
+            closes = [(day, _float(bar["4. close"], f"close on {day}")) for day, bar in series.items()]
+        except (KeyError, TypeError):
+            raise DecodeError("Malformed Alpha Vantage response: bar without a close price") from None
+        error, information = data.get("Error Message"), data.get("Information") or data.get("Note")
+
+    closes.sort(reverse=True)
+    return DailySeries(closes, error, information)
+
+
+def decode_markets(raw: bytes) -> list:
+    """
+    Decodes a CoinGecko /coins/markets response into a list of MarketRow.
+    Raises DecodeError if it isn't the expected shape.
+    """
+    if msgspec is not None:
+        try:
+            rows = _markets_decoder.decode(raw)
+        except (msgspec.DecodeError, msgspec.ValidationError) as e:
+            raise DecodeError(f"Malformed CoinGecko response: {e}") from None
+        return [
+            MarketRow(
+                r.id, r.current_price, r.price_change_24h, r.total_volume,
+                {h: getattr(r, f"price_change_percentage_{h}_in_currency") for h in CRYPTO_HORIZONS},
+            )
+            for r in rows
+        ]
+
+    try:
+        rows = json.loads(raw)
+    except ValueError as e:
+        raise DecodeError(f"Malformed CoinGecko response: {e}") from None
+    if not isinstance(rows, list) or not all(isinstance(r, dict) and isinstance(r.get("id"), str) for r in rows):
+        raise DecodeError("Malformed CoinGecko response: expected a list of coins with ids")
+
+    return [
+        MarketRow(
+            r["id"],
+            _optional_float(r, "current_price"),
+            _optional_float(r, "price_change_24h"),
+            _optional_float(r, "total_volume"),
+            {h: _optional_float(r, f"price_change_percentage_{h}_in_currency") for h in CRYPTO_HORIZONS},
+        )
+        for r in rows
+    ]
+
+
+if __name__ == "__main__":
+    # Quick test — decode a sample of each, then a malformed one
+    import time
+
+    bars = {f"2025-{m:02d}-{d:02d}": {"1. open": "101.5", "2. high": "102.0", "3. low": "100.9",
+                                      "4. close": "101.7", "5. volume": "1234567"}
+            for m in range(1, 5) for d in range(1, 26)}
+    raw = json.dumps({"Meta Data": {"2. Symbol": "VOO"}, "Time Series (Daily)": bars}).encode()
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        series = decode_daily_series(raw)
+    took = (time.perf_counter() - start) * 1000
+    print(f"Decoder: {'msgspec' if msgspec else 'json (stdlib)'} — "
+          f"{took / 1000:.3f} ms per 100-day response")
+    print("Newest two closes:", series.closes[:2])
+
+    raw = json.dumps([{"id": "bitcoin", "current_price": 97500, "price_change_24h": 3300.5,
+                       "total_volume": 3.1e10, "price_change_percentage_7d_in_currency": 8.1}]).encode()
+    print("Markets:", decode_markets(raw))
+
+    try:
+        decode_daily_series(b'{"Time Series (Daily)": {"2025-03-14": {"4. close": "n/a"}}}')
+    except DecodeError as e:
+        print("Rejected:", e)
@@ -2,81 +2,121 @@
 # CRYPTO TRACKER — PRICE FETCHER (CoinGecko edition)
 # =============================================================================
 # Uses the CoinGecko public API — no API key required.
-# Fetches current price and 24-hour percentage change for each coin in one
-# request, then reconstructs the "previous price" from those two values so the
-# rest of the pipeline (analyse / notify) works identically to the ETF tracker.
+# One call to the /coins/markets endpoint returns, for every coin at once,
+# the current price, the exact USD change over the last 24 hours, the
+# percentage change over several horizons (1h / 24h / 7d / 30d) and 24h
+# trading volume. Results are paginated (up to 250 coins per page), so even
+# a long watchlist needs only a request or two.
 #
 # CoinGecko free tier: 10–30 calls/min — well within budget for 1 call/day.
+# fetch_crypto_prices() asks providers.py for the data, which hands the coins
+# to fetch_coingecko() below (or to any other crypto provider declared there).
 
+import time
 import requests
-from config import CRYPTO_WATCHLIST
+import http_cache
+from config import CRYPTO_WATCHLIST, CRYPTO_HORIZON_THRESHOLDS, COINGECKO_SECONDS_BETWEEN_CALLS
+from decode import decode_markets, DecodeError
+from providers import fetch
 
-BASE_URL = "https://api.coingecko.com/api/v3/simple/price"
+BASE_URL = "https://api.coingecko.com/api/v3/coins/markets"
+PER_PAGE = 250  # CoinGecko's maximum page size
 
 
 def fetch_crypto_prices():
     """
-    Fetches current price and 24-hour change for each coin via CoinGecko.
+    Fetches current price, multi-horizon % changes and 24h volume for each
+    coin in CRYPTO_WATCHLIST.
 
     Returns a dict like:
     {
         "bitcoin":  {"name": "Bitcoin (BTC)",  "prev_close": 94200.00,
-                     "last_close": 97500.00,   "currency": "USD"},
+                     "last_close": 97500.00,   "currency": "USD",
+                     "volume_24h": 3.1e10,
+                     "pct_change_1h": 0.42,    "pct_change_24h": 3.50,
+                     "pct_change_7d": 8.12,    "pct_change_30d": -2.40},
         ...
     }
+    A horizon CoinGecko has no figure for (e.g. a very new coin) is None.
     Returns None for a coin if it can't be fetched.
     """
-    ids = ",".join(CRYPTO_WATCHLIST.keys())
+    return fetch({"crypto": list(CRYPTO_WATCHLIST)})["crypto"]
 
-    print(f"Fetching crypto prices for {len(CRYPTO_WATCHLIST)} coins via CoinGecko...")
 
-    try:
-        params = {
-            "ids": ids,
-            "vs_currencies": "usd",
-            "include_24hr_change": "true",
-        }
+def fetch_coingecko(ids) -> dict:
+    """Fetches each coin via CoinGecko's markets endpoint (see fetch_crypto_prices)."""
+    ids = list(ids)
+    rows = {}
 
-        response = requests.get(BASE_URL, params=params, timeout=15)
-        response.raise_for_status()
-        data = response.json()
+    print(f"Fetching crypto prices for {len(ids)} coins via CoinGecko...")
 
-    except requests.exceptions.RequestException as e:
+    try:
+        page = 1
+        while True:
+            params = {
+                "vs_currency": "usd",
+                "ids": ",".join(ids),
+                "price_change_percentage": ",".join(CRYPTO_HORIZON_THRESHOLDS),
+                "per_page": PER_PAGE,
+                "page": page,
+            }
+
+            batch = decode_markets(http_cache.get(BASE_URL, params, timeout=15))
+
+            for row in batch:
+                rows[row.id] = row
+
+            # A short page means there's nothing more to fetch
+            if len(batch) < PER_PAGE:
+                break
+            page += 1
+            time.sleep(COINGECKO_SECONDS_BETWEEN_CALLS)
+
+    except (requests.exceptions.RequestException, DecodeError) as e:
         print(f"  ❌  CoinGecko request failed: {e}")
-        return {coin_id: None for coin_id in CRYPTO_WATCHLIST}
+        return {coin_id: None for coin_id in ids}
 
     results = {}
 
-    for coin_id, name in CRYPTO_WATCHLIST.items():
-        coin_data = data.get(coin_id)
+    for coin_id in ids:
+        name = CRYPTO_WATCHLIST[coin_id]
+        coin_data = rows.get(coin_id)
 
         if not coin_data:
             print(f"  ❌  {name}: No data returned from CoinGecko")
             results[coin_id] = None
             continue
 
-        last_close = coin_data.get("usd")
-        pct_change_24h = coin_data.get("usd_24h_change")
+        last_close = coin_data.current_price
+        change_24h = coin_data.price_change_24h
 
-        if last_close is None or pct_change_24h is None:
+        if last_close is None or change_24h is None:
             print(f"  ❌  {name}: Missing price or 24h-change field")
             results[coin_id] = None
             continue
 
-        # Back-calculate what the price was 24 hours ago
-        prev_close = round(last_close / (1 + pct_change_24h / 100), 6)
+        # CoinGecko gives the 24h change in dollars, so the price 24 hours ago
+        # is exact rather than reconstructed from a rounded percentage
+        prev_close = round(last_close - change_24h, 6)
         last_close = round(last_close, 6)
 
-        results[coin_id] = {
+        record = {
             "name": name,
             "prev_close": prev_close,
             "last_close": last_close,
             "currency": "USD",
+            "volume_24h": coin_data.total_volume,
         }
-
-        sign = "+" if pct_change_24h >= 0 else ""
-        print(f"  ✅  {name}: ${prev_close:,.2f} → ${last_close:,.2f} "
-              f"({sign}{pct_change_24h:.2f}%)")
+        for horizon in CRYPTO_HORIZON_THRESHOLDS:
+            record[f"pct_change_{horizon}"] = coin_data.changes.get(horizon)
+        results[coin_id] = record
+
+        changes = "  ".join(
+            f"{h} {record[f'pct_change_{h}']:+.2f}%"
+            for h in CRYPTO_HORIZON_THRESHOLDS
+            if record[f"pct_change_{h}"] is not None
+        )
+        print(f"  ✅  {name}: ${prev_close:,.2f} → ${last_close:,.2f}  ({changes})")
 
     return results
 
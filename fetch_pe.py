@@ -5,17 +5,24 @@
 # for a rotating group of ETFs from PE_WATCHLIST.
 #
 # 20 ETFs are rotated in groups of 3 by day-of-year to stay within API limits.
+# fetch_pe_ratios() picks the group and asks providers.py for the data, which
+# hands it to fetch_yahoo_pe() below (or to any other P/E provider declared there).
 
 import yfinance as yf
 import time
 from datetime import date
-from config import PE_WATCHLIST
+from config import PE_WATCHLIST, YAHOO_SECONDS_BETWEEN_CALLS
+from providers import fetch
+from shard import select
 
 
-def fetch_pe_ratios():
+def fetch_pe_ratios(shard=None):
     """
     Fetches the current trailing P/E ratio for a rotating group of ETFs
-    from PE_WATCHLIST using Yahoo Finance.
+    from PE_WATCHLIST.
+
+    With shard=(i, N) only this worker's share of the group is fetched
+    (see shard.py).
 
     Returns a tuple of:
       - dict: { "VOO": {"name": "S&P 500", "pe_ratio": 26.5}, ... }
@@ -39,9 +46,24 @@ def fetch_pe_ratios():
         f"— full cycle every ~{-(-total // group_size)} weekdays"
     )
 
+    if shard is not None:
+        mine = set(select([ticker for ticker, _ in group], *shard))
+        group = [(ticker, name) for ticker, name in group if ticker in mine]
+
+    results = fetch({"pe": [ticker for ticker, _ in group]})["pe"]
+    return results, note
+
+
+def fetch_yahoo_pe(tickers) -> dict:
+    """
+    Fetches the current trailing P/E ratio for each ticker from Yahoo Finance.
+    Returns { "VOO": {"name": "S&P 500", "pe_ratio": 26.5}, ... }, with None
+    for a ticker whose P/E isn't available.
+    """
+    group = [(ticker, PE_WATCHLIST[ticker]) for ticker in tickers]
     results = {}
 
-    print(f"Fetching P/E ratios for {group_size} of {total} ETFs via Yahoo Finance...")
+    print(f"Fetching P/E ratios for {len(group)} ETFs via Yahoo Finance...")
 
     for i, (ticker, name) in enumerate(group):
         try:
@@ -72,9 +94,9 @@ def fetch_pe_ratios():
 
         # Small delay between requests to avoid rate limiting
         if i < len(group) - 1:
-            time.sleep(1)
+            time.sleep(YAHOO_SECONDS_BETWEEN_CALLS)
 
-    return results, note
+    return results
 
 
 if __name__ == "__main__":
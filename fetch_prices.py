@@ -5,96 +5,144 @@
 # Yahoo Finance blocks requests from cloud servers like GitHub Actions.
 # Alpha Vantage is a proper, free, official API that works reliably everywhere.
 #
-# Free tier limit: 25 requests/day — all tickers are US-listed.
-# We add a small delay between requests to stay within their rate limits.
+# Free tier limit: 25 requests/day and 5/minute per key — all tickers are
+# US-listed. Requests are spread across every configured key (see
+# key_pool.py), which also paces each key to stay within those limits.
+# fetch_prices() asks providers.py for the data, which hands the tickers to
+# fetch_alpha_vantage() below (or to any other price provider declared there).
 
-import requests
-import time
-import os
+import http_cache
 from config import WATCHLIST
+from decode import decode_daily_series, DecodeError
+from key_pool import load_pool, acquire, mark_exhausted, back_off, remaining
+from market_calendar import latest_session
+from providers import fetch
 
-# Your Alpha Vantage API key — stored as a GitHub Secret called ALPHA_VANTAGE_KEY
-API_KEY = os.environ.get("ALPHA_VANTAGE_KEY", "demo")
 BASE_URL = "https://www.alphavantage.co/query"
 
-def fetch_prices():
+
+def _request_daily(pool: dict, ticker: str):
+    """
+    Requests one ticker's daily series, moving on to another key if the one
+    used has hit a rate limit. Returns the decoded DailySeries, or None if
+    every key is out of budget for today. Raises DecodeError if the response
+    is malformed.
     """
-    Fetches the last 2 closing prices for each ticker using Alpha Vantage.
+    data = None
+    # Every key gets one try, plus one more after a per-minute back-off
+    for _ in range(len(pool["keys"]) + 1):
+        key = acquire(pool)
+        if key is None:
+            return None
+
+        params = {
+            "function": "TIME_SERIES_DAILY",
+            "symbol": ticker,
+            "outputsize": "compact",  # Only fetches last 100 days — faster
+            "apikey": key,
+        }
+        data = decode_daily_series(http_cache.get(BASE_URL, params, timeout=15))
+
+        message = data.information
+        if not message:
+            return data
+
+        # The per-minute Note also mentions the daily limit ("5 calls per
+        # minute and 500 calls per day"), so look for the burst wording first
+        lowered = message.lower()
+        if any(w in lowered for w in ("per minute", "per second", "sparingly")):
+            print(f"  ⚠️  Per-minute rate limit hit — resting that key for 60 seconds...")
+            back_off(pool, key)
+        elif "per day" in lowered or "daily" in lowered:
+            mark_exhausted(pool, key)
+        else:
+            print(f"  ⚠️  Alpha Vantage said: {message} — resting that key for 60 seconds...")
+            back_off(pool, key)
+
+    return data
+
+
+def fetch_prices(tickers=None):
+    """
+    Fetches the last 2 closing prices for each ticker, from whichever price
+    provider(s) providers.py plans for them. By default every ticker in
+    WATCHLIST is fetched; pass `tickers` to fetch only some of them.
 
     Returns a dict like:
     {
         "VDE": {"name": "Vanguard Energy Index", "prev_close": 112.34,
-                "last_close": 115.67, "currency": "USD"},
+                "last_close": 115.67, "currency": "USD",
+                "date": "2025-03-14", "prev_date": "2025-03-13"},
         ...
     }
     Returns None for a ticker if it can't be fetched.
     """
+    tickers = list(WATCHLIST) if tickers is None else list(tickers)
+    return fetch({"price": tickers})["price"]
+
+
+def fetch_alpha_vantage(tickers) -> dict:
+    """Fetches the last 2 closing prices for each ticker from Alpha Vantage (see fetch_prices)."""
+    watchlist = {t: WATCHLIST[t] for t in tickers}
     results = {}
+    pool = load_pool()
+    # Bars after the latest closed session are still in progress — skip them
+    session = latest_session().isoformat()
 
-    print(f"Fetching prices for {len(WATCHLIST)} ETFs via Alpha Vantage...")
+    print(f"Fetching prices for {len(watchlist)} ETFs via Alpha Vantage "
+          f"({len(pool['keys'])} API key(s), {remaining(pool)} requests left today)...")
 
-    for i, (ticker, name) in enumerate(WATCHLIST.items()):
+    for ticker, name in watchlist.items():
         currency = "USD"  # All tickers in WATCHLIST are US-listed
 
         try:
-            params = {
-                "function": "TIME_SERIES_DAILY",
-                "symbol": ticker,
-                "outputsize": "compact",  # Only fetches last 100 days — faster
-                "apikey": API_KEY,
-            }
+            data = _request_daily(pool, ticker)
 
-            response = requests.get(BASE_URL, params=params, timeout=15)
-            data = response.json()
+            if data is None:
+                print(f"  ❌  {name} ({ticker}): Every API key is out of budget for today — skipping")
+                results[ticker] = None
+                continue
 
             # Check for API errors
-            if "Error Message" in data:
-                print(f"  ❌  {name} ({ticker}): Ticker not found — {data['Error Message']}")
+            if data.error:
+                print(f"  ❌  {name} ({ticker}): Ticker not found — {data.error}")
+                results[ticker] = None
+                continue
+
+            if data.information:
+                print(f"  ❌  {name} ({ticker}): Still rate limited after trying every key — skipping")
                 results[ticker] = None
                 continue
 
-            if "Information" in data:
-                # This means we hit the rate limit
-                print(f"  ⚠️  Rate limit hit. Waiting 60 seconds...")
-                time.sleep(60)
-                # Retry once
-                response = requests.get(BASE_URL, params=params, timeout=15)
-                data = response.json()
-                if "Information" in data or "Error Message" in data:
-                    print(f"  ❌  {name} ({ticker}): Still rate limited after retry — skipping")
-                    results[ticker] = None
-                    continue
-
-            time_series = data.get("Time Series (Daily)", {})
-
-            if len(time_series) < 2:
+            closes = [(day, close) for day, close in data.closes if day <= session]
+            if len(closes) < 2:
                 print(f"  ⚠️  {name} ({ticker}): Not enough data returned")
                 results[ticker] = None
                 continue
 
-            # The time series is a dict keyed by date string — sort to get latest
-            sorted_dates = sorted(time_series.keys(), reverse=True)
-            last_close = round(float(time_series[sorted_dates[0]]["4. close"]), 4)
-            prev_close = round(float(time_series[sorted_dates[1]]["4. close"]), 4)
+            # Closes come back newest first, already as numbers
+            (last_date, last_close), (prev_date, prev_close) = closes[:2]
+            last_close = round(last_close, 4)
+            prev_close = round(prev_close, 4)
 
             results[ticker] = {
                 "name": name,
                 "prev_close": prev_close,
                 "last_close": last_close,
                 "currency": currency,
+                "date": last_date,       # date of the latest bar
+                "prev_date": prev_date,  # date of the bar before it
             }
             print(f"  ✅  {name} ({ticker}): {prev_close} → {last_close} {currency}")
 
+        except DecodeError as e:
+            print(f"  ❌  {name} ({ticker}): {e}")
+            results[ticker] = None
+
         except Exception as e:
             print(f"  ❌  {name} ({ticker}): Failed — {e}")
             results[ticker] = None
 
-        # Alpha Vantage free tier allows 5 requests/minute.
-        # We wait 13 seconds between each request to stay safely under that.
-        # (Only pause between requests, not after the last one)
-        if i < len(WATCHLIST) - 1:
-            time.sleep(13)
-
     return results
 
 
@@ -0,0 +1,156 @@
+# =============================================================================
+# ETF TRACKER — CURRENCY CONVERSION
+# =============================================================================
+# Our holdings are in NZD, but the US proxy ETFs we watch are priced in USD —
+# and the exchange-rate move is part of what we actually gain or lose.
+# This module fetches daily exchange rates so analyse() can report every
+# move in HOME_CURRENCY.
+#
+# Rates come from Frankfurter (European Central Bank reference rates — free,
+# no API key). All the rates a run needs (every foreign currency, every date)
+# are fetched in ONE request, then cached in STATE_DIR for FX_CACHE_TTL_HOURS
+# so repeat runs don't fetch them again.
+
+import bisect
+import json
+import os
+from datetime import date, datetime, timedelta
+import requests
+import http_cache
+from config import STATE_DIR, HOME_CURRENCY, FX_CACHE_TTL_HOURS
+
+BASE_URL = "https://api.frankfurter.app"
+CACHE_FILE = os.path.join(STATE_DIR, "fx_cache.json")
+
+# Rates are published on business days only; look back this far to find the
+# most recent rate on or before a weekend / holiday date
+LOOKBACK_DAYS = 7
+
+# Dates older than this are dropped from the cache
+KEEP_DAYS = 60
+
+
+def load_cache(path: str = CACHE_FILE) -> dict:
+    """
+    Loads cached rates:
+    {
+        "home":       "NZD",
+        "fetched_at": "2025-03-14T17:02:11",
+        "rates":      {"2025-03-13": {"USD": 0.5712, "AUD": 0.9034}, ...},
+    }
+    Rates are units of foreign currency per 1 unit of home currency.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("home") == HOME_CURRENCY:
+            return cache
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Could not read {path} ({e}) — fetching exchange rates fresh")
+    return {"home": HOME_CURRENCY, "fetched_at": None, "rates": {}}
+
+
+def save_cache(cache: dict, path: str = CACHE_FILE):
+    """Writes the rate cache back to disk, dropping dates older than KEEP_DAYS."""
+    cutoff = (date.today() - timedelta(days=KEEP_DAYS)).isoformat()
+    cache["rates"] = {d: r for d, r in cache["rates"].items() if d >= cutoff}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+
+
+def rate_on(rates: dict, currency: str, day: str, _dates: list = None):
+    """
+    Units of `currency` per 1 home-currency unit on `day`, using the most
+    recent published rate on or before it (within LOOKBACK_DAYS).
+    Returns None if there isn't one.
+
+    `_dates` is the sorted list of dates in `rates` — pass it in when looking
+    up many rates from the same table to avoid re-sorting each time.
+    """
+    dates = _dates if _dates is not None else sorted(rates)
+    earliest = (date.fromisoformat(day) - timedelta(days=LOOKBACK_DAYS)).isoformat()
+
+    i = bisect.bisect_right(dates, day)
+    while i > 0 and dates[i - 1] >= earliest:
+        i -= 1
+        rate = rates[dates[i]].get(currency)
+        if rate:
+            return rate
+    return None
+
+
+def _fetch(currencies: set, start: str, end: str) -> dict:
+    """One request for every currency over the whole date range."""
+    url = f"{BASE_URL}/{start}..{end}"
+    params = {"from": HOME_CURRENCY, "to": ",".join(sorted(currencies))}
+
+    return json.loads(http_cache.get(url, params, timeout=15)).get("rates", {})
+
+
+def get_rates(prices: dict, offline: bool = False) -> dict:
+    """
+    Returns the exchange rates needed to convert `prices` (the output of
+    fetch_prices) into HOME_CURRENCY: {date: {currency: rate}}.
+
+    Uses the cache when it already covers every currency and date, or when
+    it's younger than FX_CACHE_TTL_HOURS (the newest day's rate may simply
+    not be published yet). Otherwise fetches everything missing in one
+    request. With offline=True, only the cache is used.
+    Returns an empty dict if nothing needs converting or no rates are available.
+    """
+    needed = {}  # currency -> dates
+    for data in prices.values():
+        if not data or data["currency"] == HOME_CURRENCY:
+            continue
+        days = needed.setdefault(data["currency"], set())
+        days.update(d for d in (data.get("prev_date"), data.get("date")) if d)
+
+    if not needed:
+        return {}
+
+    cache = load_cache()
+    rates = cache["rates"]
+
+    exact = all(c in rates.get(d, {}) for c, days in needed.items() for d in days)
+    fresh = cache["fetched_at"] and (
+        datetime.now() - datetime.fromisoformat(cache["fetched_at"])
+        < timedelta(hours=FX_CACHE_TTL_HOURS)
+    )
+    if exact or offline:
+        return rates
+
+    dates = sorted(rates)
+    covered = all(rate_on(rates, c, d, dates) for c, days in needed.items() for d in days)
+    if fresh and covered:
+        return rates
+
+    all_days = sorted(d for days in needed.values() for d in days)
+    start = (date.fromisoformat(all_days[0]) - timedelta(days=LOOKBACK_DAYS)).isoformat()
+    end = all_days[-1]
+
+    print(f"  Fetching {HOME_CURRENCY} exchange rates for {', '.join(sorted(needed))} "
+          f"({start} to {end})...")
+    try:
+        fetched = _fetch(set(needed), start, end)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"  ⚠️  Exchange rate request failed ({e}) — using cached rates where available")
+        return rates
+
+    for day, day_rates in fetched.items():
+        rates.setdefault(day, {}).update(day_rates)
+    cache["fetched_at"] = datetime.now().isoformat(timespec="seconds")
+    save_cache(cache)
+    return rates
+
+
+if __name__ == "__main__":
+    dummy = {
+        "VOO": {"name": "S&P 500", "prev_close": 500.0, "last_close": 510.0,
+                "currency": "USD", "prev_date": "2025-03-13", "date": "2025-03-14"},
+    }
+    rates = get_rates(dummy)
+    print(f"USD per 1 {HOME_CURRENCY}:",
+          {d: rate_on(rates, "USD", d) for d in ("2025-03-13", "2025-03-14", "2025-03-16")})
@@ -0,0 +1,148 @@
+# =============================================================================
+# ETF TRACKER — CONDITIONAL, COMPRESSED HTTP
+# =============================================================================
+# Every fetcher's GET requests go through get() here, which:
+#
+#   - asks for a compressed response (gzip/deflate, plus brotli or zstd when
+#     the optional `brotli` / `zstandard` packages are installed)
+#   - keeps each response that carries a validator (ETag or Last-Modified)
+#     in STATE_DIR/http_cache/, and sends it back next time (If-None-Match /
+#     If-Modified-Since). If the data hasn't changed the server answers
+#     "304 Not Modified" with an empty body, and the saved copy is used.
+#   - counts bytes downloaded and bytes saved, printed at the end of a run by
+#     report() — so a rerun on unchanged data shows how little it fetched.
+#
+# API keys are left out of the cache key, so the same series fetched with a
+# different key from the pool still matches — and keys never reach the disk.
+
+import hashlib
+import json
+import os
+import time
+import requests
+from urllib3.util.request import ACCEPT_ENCODING  # what urllib3 can decompress here
+from config import STATE_DIR, HTTP_CACHE_KEEP_DAYS
+
+CACHE_DIR = os.path.join(STATE_DIR, "http_cache")
+
+# Query parameters that are credentials, not part of what's being asked for
+SECRET_PARAMS = ("apikey",)
+
+# This run's transfer counts (see report())
+stats = {"requests": 0, "not_modified": 0, "downloaded": 0, "uncompressed": 0, "saved": 0}
+
+_pruned = False
+
+
+def _cache_path(url: str, params: dict) -> str:
+    public = sorted((k, str(v)) for k, v in (params or {}).items() if k not in SECRET_PARAMS)
+    key = hashlib.sha256(json.dumps([url, public]).encode()).hexdigest()[:24]
+    return os.path.join(CACHE_DIR, key)
+
+
+def _load(path: str):
+    """Returns (validators, body) for a cached response, or (None, None)."""
+    try:
+        with open(path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(path + ".body", "rb") as f:
+            return meta, f.read()
+    except FileNotFoundError:
+        return None, None
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Could not read cached response {path} ({e}) — downloading in full")
+        return None, None
+
+
+def _store(path: str, response: requests.Response, downloaded: int):
+    meta = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "downloaded": downloaded,  # what this body cost to download, for the savings count
+    }
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(path + ".body", "wb") as f:
+            f.write(response.content)
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    except OSError as e:
+        print(f"  ⚠️  Could not cache response ({e}) — the next run will download it in full")
+
+
+def _prune():
+    """Removes cached responses that haven't been used for HTTP_CACHE_KEEP_DAYS."""
+    cutoff = time.time() - HTTP_CACHE_KEEP_DAYS * 86400
+    try:
+        entries = os.scandir(CACHE_DIR)
+    except OSError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+
+
+def get(url: str, params: dict = None, timeout: float = 15) -> bytes:
+    """
+    GET a URL and return the (decompressed) response body.
+
+    Sends the cached validators for this URL + params if there are any, and
+    returns the cached body when the server says it hasn't changed.
+    Raises requests.exceptions.RequestException on a network error or an
+    error status, like requests.get() followed by raise_for_status().
+    """
+    global _pruned
+    if not _pruned:
+        _prune()
+        _pruned = True
+
+    path = _cache_path(url, params)
+    meta, body = _load(path)
+
+    headers = {"Accept-Encoding": ACCEPT_ENCODING}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = requests.get(url, params=params, headers=headers, timeout=timeout)
+    content = response.content
+    # Bytes that actually came over the wire (compressed), not the decoded size
+    downloaded = response.raw.tell() if response.raw is not None else len(content)
+    stats["requests"] += 1
+    stats["downloaded"] += downloaded
+
+    if response.status_code == 304 and body is not None:
+        stats["not_modified"] += 1
+        stats["saved"] += meta.get("downloaded", len(body))
+        for suffix in (".json", ".body"):
+            os.utime(path + suffix)  # still in use — keep it from being pruned
+        return body
+
+    response.raise_for_status()
+    stats["uncompressed"] += len(content)
+    if response.headers.get("ETag") or response.headers.get("Last-Modified"):
+        _store(path, response, downloaded)
+    return content
+
+
+def report():
+    """Prints this run's download totals (nothing if no requests were made)."""
+    if not stats["requests"]:
+        return
+    print(f"\n  🌐  {stats['requests']} HTTP request(s): "
+          f"{stats['downloaded'] / 1024:.1f} KB downloaded "
+          f"({stats['uncompressed'] / 1024:.1f} KB uncompressed), "
+          f"{stats['not_modified']} unchanged since last time "
+          f"— {stats['saved'] / 1024:.1f} KB not downloaded again")
+
+
+if __name__ == "__main__":
+    # Quick test — fetch the same URL twice; the second should be a 304 if
+    # the server supports validators
+    url = "https://api.frankfurter.app/latest"
+    for _ in range(2):
+        print(len(get(url, {"from": "NZD", "to": "USD"})), "bytes")
+    report()
@@ -0,0 +1,182 @@
+# =============================================================================
+# ETF TRACKER — ALPHA VANTAGE KEY POOL
+# =============================================================================
+# The free Alpha Vantage tier allows 5 requests/minute and 25/day *per key*.
+# With several keys (ALPHA_VANTAGE_KEYS="key1,key2,key3"), requests are
+# spread across all of them, so both the daily budget and the per-minute
+# pace grow with the number of keys.
+#
+# Each request goes to the key that is ready soonest (least-used today
+# breaks ties), which works out as round-robin in practice. A key that
+# reports its daily limit is taken out of rotation until the next day.
+# Daily counts are saved in STATE_DIR so they carry across runs.
+# Keys themselves are never written to disk — only a short hash of each.
+#
+# Pacing is per process: two processes must not share a key (e.g. local
+# --shard workers — give each its own ALPHA_VANTAGE_KEYS). Processes with
+# different keys can share the usage file; each only updates its own keys.
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows — no file locking; saves are still atomic
+    fcntl = None
+from config import (
+    STATE_DIR,
+    ALPHA_VANTAGE_KEYS,
+    ALPHA_VANTAGE_DAILY_LIMIT,
+    ALPHA_VANTAGE_SECONDS_BETWEEN_CALLS,
+)
+from market_calendar import MARKET_TZ
+
+USAGE_FILE = os.path.join(STATE_DIR, "alpha_vantage_keys.json")
+
+
+def _key_id(key: str) -> str:
+    """Short, non-reversible label for a key — safe to store and print."""
+    return hashlib.sha256(key.encode()).hexdigest()[:10]
+
+
+def _today() -> str:
+    # Alpha Vantage daily limits reset at midnight US Eastern time
+    return datetime.now(MARKET_TZ).date().isoformat()
+
+
+def load_pool(keys: list = ALPHA_VANTAGE_KEYS, path: str = USAGE_FILE) -> dict:
+    """
+    Loads today's usage for each key. Counts from an earlier day are reset.
+
+    Returns a dict:
+    {
+        "keys":  ["abc...", ...],
+        "usage": {"<key id>": {"date": "2025-03-14", "used": 12, "exhausted": False}},
+        "ready": {"<key id>": 0.0},   # time.monotonic() when the key may be used next
+        "path":  "state/alpha_vantage_keys.json",
+    }
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        saved = {}
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Could not read {path} ({e}) — assuming all API keys are unused today")
+        saved = {}
+
+    today = _today()
+    usage = {}
+    for key in keys:
+        entry = saved.get(_key_id(key))
+        if not entry or entry.get("date") != today:
+            entry = {"date": today, "used": 0, "exhausted": False}
+        usage[_key_id(key)] = entry
+
+    return {"keys": list(keys), "usage": usage, "ready": dict.fromkeys(usage, 0.0), "path": path}
+
+
+@contextmanager
+def _locked(path: str):
+    """Holds an exclusive lock on `path`.lock while other processes may write `path`."""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def save_pool(pool: dict):
+    """
+    Writes today's per-key usage back to disk, keeping the entries of keys
+    this process isn't using (another worker's keys).
+    """
+    path = pool["path"]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _locked(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = {}
+        saved.update(pool["usage"])
+
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(saved, f, indent=2)
+        os.replace(temp, path)
+
+
+def remaining(pool: dict) -> int:
+    """Requests left today across all keys still in rotation."""
+    return sum(
+        max(0, ALPHA_VANTAGE_DAILY_LIMIT - u["used"])
+        for u in pool["usage"].values() if not u["exhausted"]
+    )
+
+
+def acquire(pool: dict):
+    """
+    Picks the key to use for the next request, waiting if every key with
+    budget left was used too recently. Counts the request against it.
+
+    Returns the key, or None if every key is out of budget for today.
+    """
+    usage, ready = pool["usage"], pool["ready"]
+    available = [
+        k for k in pool["keys"]
+        if not usage[_key_id(k)]["exhausted"]
+        and usage[_key_id(k)]["used"] < ALPHA_VANTAGE_DAILY_LIMIT
+    ]
+    if not available:
+        return None
+
+    key = min(available, key=lambda k: (ready[_key_id(k)], usage[_key_id(k)]["used"]))
+    key_id = _key_id(key)
+
+    wait = ready[key_id] - time.monotonic()
+    if wait > 0:
+        time.sleep(wait)
+
+    ready[key_id] = time.monotonic() + ALPHA_VANTAGE_SECONDS_BETWEEN_CALLS
+    usage[key_id]["used"] += 1
+    save_pool(pool)
+    return key
+
+
+def mark_exhausted(pool: dict, key: str):
+    """Takes a key out of rotation for the rest of the day (it hit its daily limit)."""
+    key_id = _key_id(key)
+    pool["usage"][key_id]["exhausted"] = True
+    save_pool(pool)
+    print(f"  ⚠️  API key {key_id} has hit its daily limit — "
+          f"{len([u for u in pool['usage'].values() if not u['exhausted']])} key(s) left in rotation")
+
+
+def back_off(pool: dict, key: str, seconds: float = 60):
+    """Rests a key that hit its per-minute limit; other keys carry on meanwhile."""
+    pool["ready"][_key_id(key)] = time.monotonic() + seconds
+
+
+if __name__ == "__main__":
+    # Quick test with dummy keys and a temporary usage file
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "keys.json")
+    pool = load_pool(["key-one", "key-two", "key-three"], path)
+    print("Requests left today:", remaining(pool))
+
+    start = time.monotonic()
+    order = [_key_id(acquire(pool)) for _ in range(3)]
+    print("First three requests used:", order, f"(took {time.monotonic() - start:.1f}s)")
+
+    mark_exhausted(pool, "key-two")
+    print("Requests left today:", remaining(pool))
@@ -3,39 +3,253 @@
 # =============================================================================
 # This is the file you run (or GitHub Actions runs for you).
 # It ties together fetching, analysis, and notification in sequence.
+#
+#   python main.py                     # normal run
+#   python main.py --from-snapshot     # re-run against the last saved data,
+#                                      # no network calls, nothing sent
+#   python main.py --force             # fetch everything, even if no new
+#                                      # trading session has closed
+#   python main.py --shard 2/3         # fetch only this worker's share of the
+#                                      # watchlist and save it (see shard.py)
+#   python main.py --merge 3           # combine the 3 workers' results,
+#                                      # analyse and notify once
+#
+# Before fetching, the run checks the US market calendar: tickers whose newest
+# bar is already the latest closed session are skipped, and if that's all of
+# them (a holiday, or a second run on the same day) the run ends straight away.
 
+import argparse
+from config import WATCHLIST, ALERT_RULES
 from fetch_prices import fetch_prices
 from analyse import analyse
+from fx import get_rates
+from correlate import load_state, save_state, update_from_prices, cluster_movers
 from notify import send_notification
+from pe_history import load_history, HISTORY_FILE
+from rules import compile_rules, evaluate, build_table
+from subscribers import validate_subscribers, route, topic_url
+from profiling import start_profiling, stage
+import http_cache
+from snapshot import write_snapshot, read_snapshot, resolve_snapshot
+from market_calendar import latest_session, load_last_seen, save_last_seen, tickers_needing_fetch
+from shard import parse_shard, parse_shard_count, select, run_id, write_partial, merge_partials, clear_partials
 
 
-def main():
+def _drop_reported(prices: dict, last_seen: dict, session, force: bool):
+    """
+    Drops tickers whose bar hasn't changed since it was last reported —
+    their move went out in an earlier notification — and records the rest
+    in `last_seen` (saved once the run's notifications have gone out).
+    Returns {ticker: date recorded before} for the tickers it recorded, so
+    _forget_undelivered() can undo them.
+
+    A bar dated after `session` (the latest closed session) is still in
+    progress: it's dropped and not recorded, so its closing move is fetched
+    and reported once the session has closed. A recorded date after
+    `session` came from such a bar, so it's ignored and overwritten.
+    """
+    cutoff = session.isoformat()
+    bars = last_seen.setdefault("bars", {})
+    previous = {}
+    for ticker, data in list(prices.items()):
+        if data is None:
+            continue
+        recorded = bars.get(ticker, "")
+        if recorded > cutoff:
+            recorded = ""
+        if data["date"] > cutoff:
+            print(f"  ⏳  {ticker}: bar for {data['date']} is still in progress — "
+                  f"reporting it after the close")
+            del prices[ticker]
+        elif not force and data["date"] <= recorded:
+            print(f"  ⏭️  {ticker}: no new bar since {data['date']} — not reporting again")
+            del prices[ticker]
+        else:
+            previous[ticker] = bars.get(ticker)
+            bars[ticker] = max(data["date"], recorded)
+    return previous
+
+
+def _forget_undelivered(last_seen: dict, previous: dict, topic_analysis: dict):
+    """
+    Puts back the last-seen dates of the tickers a topic's failed notification
+    was about, so the next run fetches and reports them again.
+    """
+    bars = last_seen["bars"]
+    tickers = {m["ticker"] for m in topic_analysis["movers"]}
+    tickers |= {h["ticker"] for h in topic_analysis["rule_hits"]}
+    for ticker in tickers & previous.keys():
+        if previous[ticker] is None:
+            bars.pop(ticker, None)
+        else:
+            bars[ticker] = previous[ticker]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ETF price movement report")
+    parser.add_argument(
+        "--from-snapshot", nargs="?", const="latest", metavar="PATH",
+        help="re-run analysis and preview the notification from a saved snapshot "
+             "(default: the newest one) — no network calls",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="fetch and report every ticker, even if no new trading session has closed",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="profile each stage (CPU time and memory) and save the results under profiles/",
+    )
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument(
+        "--shard", type=parse_shard, metavar="i/N",
+        help="fetch only shard i of N of the watchlist and save it for --merge",
+    )
+    modes.add_argument(
+        "--merge", type=parse_shard_count, metavar="N",
+        help="combine the saved results of N --shard workers, then analyse and notify",
+    )
+    args = parser.parse_args(argv)
+    offline = args.from_snapshot is not None
+    if offline and (args.shard is not None or args.merge is not None):
+        parser.error("--from-snapshot can't be combined with --shard or --merge")
+
+    # Compile custom alert rules and check subscribers up front so a typo
+    # fails before any fetching
+    compiled_rules = compile_rules(ALERT_RULES)
+    validate_subscribers()
+
     print("=" * 50)
     print("  ETF TRACKER — Daily Report")
     print("=" * 50)
+    profiling = start_profiling("etf", args.profile)
+
+    # Step 1: Fetch latest prices from Alpha Vantage (or load a saved snapshot)
+    with stage(profiling, "fetch"):
+        if offline:
+            folder = resolve_snapshot("etf", args.from_snapshot)
+            print(f"\n[1/3] Loading prices from snapshot {folder}...")
+            prices, extra = read_snapshot(folder)
+            fx_rates = extra.get("fx")  # exchange rates the snapshot was analysed with
+            last_seen, previous = None, {}
+        elif args.merge is not None:
+            print(f"\n[1/3] Merging prices from {args.merge} shard(s)...")
+            fx_rates = None
+            prices, _ = merge_partials("etf", args.merge, run_id(latest_session()))
+            if not prices:
+                clear_partials("etf", args.merge)
+                print("  No shard fetched anything new. Nothing to do.")
+                print("\nDone. ✅")
+                return
+            last_seen = load_last_seen()
+            previous = _drop_reported(prices, last_seen, latest_session(), args.force)
+        else:
+            print("\n[1/3] Fetching prices...")
+            fx_rates = None
+            session = latest_session()
+            last_seen = load_last_seen()
+            watchlist = select(WATCHLIST, *args.shard) if args.shard is not None else list(WATCHLIST)
+            tickers = watchlist if args.force else tickers_needing_fetch(watchlist, last_seen, session)
+
+            # A shard worker only fetches; the merge step does everything else
+            if args.shard is not None:
+                i, n = args.shard
+                print(f"  Shard {i}/{n}: {len(watchlist)} of {len(WATCHLIST)} ETFs")
+                path = write_partial("etf", i, n, run_id(session),
+                                     fetch_prices(tickers) if tickers else {})
+                print(f"\n  Saved partial result to {path}")
+                http_cache.report()
+                print("\nDone. ✅")
+                return
+
+            if not tickers:
+                print(f"  No new trading session since the last run (latest close: {session}). "
+                      f"Nothing to do.")
+                print("\nDone. ✅")
+                return
+
+            if len(tickers) < len(WATCHLIST):
+                print(f"  {len(WATCHLIST) - len(tickers)} ETFs already up to date "
+                      f"for the {session} session — skipping them")
+            prices = fetch_prices(tickers)
+            previous = _drop_reported(prices, last_seen, session, args.force)
+
+    # Step 2: Convert into home currency and analyse the price changes
+    with stage(profiling, "analyse"):
+        print("\n[2/3] Analysing movements...")
+        if fx_rates is None:
+            fx_rates = get_rates(prices, offline)
+        analysis = analyse(prices, fx_rates)
+
+        total = len(analysis["all"])
+        movers = len(analysis["movers"])
+        print(f"  Tracked {total} ETFs — {movers} moved ≥ threshold")
+
+        # Fold today's returns into the rolling correlation matrix, then group
+        # movers that normally move together so the alert lists each group once.
+        # A snapshot re-run only reads the matrix — its bar was already counted.
+        correlation_state = load_state()
+        correlation_updated = not offline and update_from_prices(correlation_state, prices)
+        analysis["clusters"] = cluster_movers(correlation_state, analysis["movers"])
+
+        # Check custom alert rules against the price moves joined with each ETF's
+        # latest P/E ratio
+        table = build_table(analysis, load_history())
+        pe_rules = [name for name, used in zip(compiled_rules["names"], compiled_rules["fields"])
+                    if {"pe_ratio", "pe_percentile"} & set(used)]
+        if pe_rules and table and all(row.get("pe_ratio") is None for row in table):
+            print(f"  ⚠️  No P/E ratios in {HISTORY_FILE} for any of these ETFs — "
+                  f"rule(s) {', '.join(pe_rules)} can't match until the P/E tracker has saved some")
+        analysis["rule_hits"] = evaluate(compiled_rules, table)
+        analysis["has_alert"] = analysis["has_alert"] or bool(analysis["rule_hits"])
+        if analysis["rule_hits"]:
+            print(f"  {len(analysis['rule_hits'])} custom rule match(es): "
+                  + ", ".join(f"{h['rule']} ({h['ticker']})" for h in analysis["rule_hits"]))
+
+        if correlation_updated:
+            save_state(correlation_state)
 
-    # Step 1: Fetch latest prices from Alpha Vantage
-    print("\n[1/3] Fetching prices...")
-    prices = fetch_prices()
+        grouped = [c for c in analysis["clusters"] if len(c) > 1]
+        if grouped:
+            print(f"  Grouped correlated movers: "
+                  + "; ".join(", ".join(m["ticker"] for m in c) for c in grouped))
 
-    # Step 2: Analyse the price changes
-    print("\n[2/3] Analysing movements...")
-    analysis = analyse(prices)
+        if analysis["all"]:
+            print("\n  Full leaderboard:")
+            for etf in analysis["all"]:
+                sign = "+" if etf["pct_change"] > 0 else ""
+                print(f"    {etf['direction']}  {etf['name']:40s}  {sign}{etf['pct_change']}%")
 
-    total = len(analysis["all"])
-    movers = len(analysis["movers"])
-    print(f"  Tracked {total} ETFs — {movers} moved ≥ threshold")
+        if not offline and any(prices.values()):
+            folder = write_snapshot("etf", prices, analysis, {"fx": fx_rates})
+            print(f"\n  Saved snapshot to {folder}")
 
-    if analysis["all"]:
-        print("\n  Full leaderboard:")
-        for etf in analysis["all"]:
-            sign = "+" if etf["pct_change"] > 0 else ""
-            print(f"    {etf['direction']}  {etf['name']:40s}  {sign}{etf['pct_change']}%")
+    # Step 3: Send each subscriber's topic one notification with the moves
+    # on their watchlist that hit their threshold
+    with stage(profiling, "notify"):
+        print("\n[3/3] Sending notifications...")
+        delivered = True
+        for topic, topic_analysis in route(analysis).items():
+            print(f"\n  → {', '.join(topic_analysis['subscribers'])}")
+            topic_analysis["clusters"] = cluster_movers(correlation_state, topic_analysis["movers"])
+            sent = send_notification(topic_analysis, dry_run=offline, url=topic_url(topic))
+            if topic_analysis["has_alert"] and not sent and not offline:
+                delivered = False
+                _forget_undelivered(last_seen, previous, topic_analysis)
 
-    # Step 3: Send notification if anything hit the threshold
-    print("\n[3/3] Sending notification...")
-    send_notification(analysis)
+        # Only now remember what this run has seen — a crash before this point,
+        # or a topic whose notification failed, leaves those bars to be
+        # re-fetched and reported by the next run instead of being lost
+        if last_seen is not None:
+            save_last_seen(last_seen)
+        if not delivered:
+            print("\n  ⚠️  Some notifications weren't delivered — their moves will be "
+                  "reported again next run")
 
+    # Keep the partials if anything failed to send, so re-running the merge resends it
+    if args.merge is not None and delivered:
+        clear_partials("etf", args.merge)
+    http_cache.report()
     print("\nDone. ✅")
 
 
@@ -3,39 +3,86 @@
 # =============================================================================
 # Entry point for the crypto price alert system.
 # Ties together fetching, analysis, and notification in sequence.
+#
+#   python main_crypto.py                     # normal run
+#   python main_crypto.py --from-snapshot     # re-run against the last saved
+#                                             # data, no network calls
 
+import argparse
+from config import ALERT_RULES
 from fetch_crypto_prices import fetch_crypto_prices
 from analyse_crypto import analyse_crypto
 from notify import send_crypto_notification
+from profiling import start_profiling, stage
+import http_cache
+from snapshot import write_snapshot, read_snapshot, resolve_snapshot
+from rules import compile_rules, evaluate, build_table
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crypto price movement report")
+    parser.add_argument(
+        "--from-snapshot", nargs="?", const="latest", metavar="PATH",
+        help="re-run analysis and preview the notification from a saved snapshot "
+             "(default: the newest one) — no network calls",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="profile each stage (CPU time and memory) and save the results under profiles/",
+    )
+    args = parser.parse_args(argv)
+    offline = args.from_snapshot is not None
+
+    # Compile custom alert rules up front so a typo fails before any fetching
+    compiled_rules = compile_rules(ALERT_RULES)
+
     print("=" * 50)
-    print("  CRYPTO TRACKER — 24h Report")
+    print("  CRYPTO TRACKER — Multi-horizon Report")
     print("=" * 50)
+    profiling = start_profiling("crypto", args.profile)
 
-    # Step 1: Fetch latest prices from CoinGecko
-    print("\n[1/3] Fetching prices...")
-    prices = fetch_crypto_prices()
+    # Step 1: Fetch latest prices from CoinGecko (or load a saved snapshot)
+    with stage(profiling, "fetch"):
+        if offline:
+            folder = resolve_snapshot("crypto", args.from_snapshot)
+            print(f"\n[1/3] Loading prices from snapshot {folder}...")
+            prices, _ = read_snapshot(folder)
+        else:
+            print("\n[1/3] Fetching prices...")
+            prices = fetch_crypto_prices()
 
     # Step 2: Analyse the price changes
-    print("\n[2/3] Analysing movements...")
-    analysis = analyse_crypto(prices)
+    with stage(profiling, "analyse"):
+        print("\n[2/3] Analysing movements...")
+        analysis = analyse_crypto(prices)
+
+        total = len(analysis["all"])
+        movers = len(analysis["movers"])
+        print(f"  Tracked {total} coins — {movers} moved ≥ threshold")
+
+        # Check custom alert rules against the crypto moves
+        analysis["rule_hits"] = evaluate(compiled_rules, build_table(crypto_analysis=analysis))
+        analysis["has_alert"] = analysis["has_alert"] or bool(analysis["rule_hits"])
+        if analysis["rule_hits"]:
+            print(f"  {len(analysis['rule_hits'])} custom rule match(es): "
+                  + ", ".join(f"{h['rule']} ({h['ticker']})" for h in analysis["rule_hits"]))
 
-    total = len(analysis["all"])
-    movers = len(analysis["movers"])
-    print(f"  Tracked {total} coins — {movers} moved ≥ threshold")
+        if analysis["all"]:
+            print("\n  Full leaderboard:")
+            for coin in analysis["all"]:
+                changes = "  ".join(f"{h} {v:+.2f}%" for h, v in coin["changes"].items())
+                flag = f"  ⚠️ {', '.join(coin['triggers'])}" if coin["triggers"] else ""
+                print(f"    {coin['direction']}  {coin['name']:30s}  {changes}{flag}")
 
-    if analysis["all"]:
-        print("\n  Full leaderboard:")
-        for coin in analysis["all"]:
-            sign = "+" if coin["pct_change"] > 0 else ""
-            print(f"    {coin['direction']}  {coin['name']:30s}  {sign}{coin['pct_change']}%")
+        if not offline and any(prices.values()):
+            print(f"\n  Saved snapshot to {write_snapshot('crypto', prices, analysis)}")
 
     # Step 3: Send notification if anything hit the threshold
-    print("\n[3/3] Sending notification...")
-    send_crypto_notification(analysis)
+    with stage(profiling, "notify"):
+        print("\n[3/3] Sending notification...")
+        send_crypto_notification(analysis, dry_run=offline)
 
+    http_cache.report()
     print("\nDone. ✅")
 
 
@@ -6,42 +6,141 @@
 #
 # This is separate from main.py (which handles price % change alerts) so
 # P/E checks can run on their own schedule — once daily rather than twice.
+#
+#   python main_pe.py                     # normal run
+#   python main_pe.py --from-snapshot     # re-run against the last saved data,
+#                                         # no network calls, nothing sent
+#   python main_pe.py --force             # run even if no new trading session
+#                                         # has closed since the last report
+#   python main_pe.py --shard 2/3         # fetch only this worker's share and
+#                                         # save it (see shard.py)
+#   python main_pe.py --merge 3           # combine the workers' results,
+#                                         # analyse and notify once
+#
+# P/E ratios only change when the market trades, so the run checks the US
+# market calendar first and ends straight away if the last report already
+# covered the latest closed session (weekends, holidays, re-runs).
 
-from fetch_pe import fetch_pe_ratios
+import argparse
+from datetime import date
 from analyse_pe import analyse_pe
+from pe_history import load_history, save_history, record
 from notify import send_pe_notification
+from profiling import start_profiling, stage
+from snapshot import write_snapshot, read_snapshot, resolve_snapshot
+from market_calendar import latest_session, load_last_seen, save_last_seen
+from shard import parse_shard, parse_shard_count, run_id, write_partial, merge_partials, clear_partials
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ETF P/E ratio report")
+    parser.add_argument(
+        "--from-snapshot", nargs="?", const="latest", metavar="PATH",
+        help="re-run analysis and preview the notification from a saved snapshot "
+             "(default: the newest one) — no network calls",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="fetch P/E ratios even if no new trading session has closed",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="profile each stage (CPU time and memory) and save the results under profiles/",
+    )
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument(
+        "--shard", type=parse_shard, metavar="i/N",
+        help="fetch only shard i of N of today's group and save it for --merge",
+    )
+    modes.add_argument(
+        "--merge", type=parse_shard_count, metavar="N",
+        help="combine the saved results of N --shard workers, then analyse and notify",
+    )
+    args = parser.parse_args(argv)
+    offline = args.from_snapshot is not None
+    if offline and (args.shard is not None or args.merge is not None):
+        parser.error("--from-snapshot can't be combined with --shard or --merge")
+
     print("=" * 50)
     print("  ETF TRACKER — P/E Ratio Report")
     print("=" * 50)
+    profiling = start_profiling("pe", args.profile)
+
+    # Step 1: Fetch P/E ratios for today's rotation group (or load a saved snapshot)
+    with stage(profiling, "fetch"):
+        if offline:
+            folder = resolve_snapshot("pe", args.from_snapshot)
+            print(f"\n[1/3] Loading P/E ratios from snapshot {folder}...")
+            pe_data, extra = read_snapshot(folder)
+            rotation_note = extra.get("note")
+        else:
+            session = latest_session().isoformat()
+            last_seen = load_last_seen()
+            if last_seen.get("pe_session") == session and not args.force:
+                print(f"\n  Already reported P/E ratios for the {session} session. Nothing to do.")
+                print("\nDone. ✅")
+                return
 
-    # Step 1: Fetch P/E ratios for today's rotation group
-    print("\n[1/3] Fetching P/E ratios...")
-    pe_data, rotation_note = fetch_pe_ratios()
+            if args.merge is not None:
+                print(f"\n[1/3] Merging P/E ratios from {args.merge} shard(s)...")
+                pe_data, extras = merge_partials("pe", args.merge, run_id(session))
+                rotation_note = next((e["note"] for e in extras if e.get("note")), None)
+            else:
+                print("\n[1/3] Fetching P/E ratios...")
+                # Imported here so a skipped run doesn't pay for loading yfinance/pandas
+                from fetch_pe import fetch_pe_ratios
+                pe_data, rotation_note = fetch_pe_ratios(args.shard)
 
-    # Step 2: Classify each ETF as above or below the threshold
-    print("\n[2/3] Analysing P/E ratios...")
-    pe_analysis = analyse_pe(pe_data)
-    pe_analysis["note"] = rotation_note  # passed through to the notification
+            # A shard worker only fetches; the merge step does everything else
+            if args.shard is not None:
+                path = write_partial("pe", *args.shard, run_id(session), pe_data, {"note": rotation_note})
+                print(f"\n  Saved partial result to {path}")
+                print("\nDone. ✅")
+                return
 
-    tracked = len(pe_analysis["all"])
-    skipped = len(pe_analysis["skipped"])
-    above = len(pe_analysis["above"])
-    below = len(pe_analysis["below"])
-    print(f"  Retrieved P/E for {tracked} ETFs ({skipped} skipped — no data available)")
-    print(f"  {above} above threshold, {below} below threshold")
+    # Step 2: Rank each ETF against its own P/E history, then add today's values
+    with stage(profiling, "analyse"):
+        print("\n[2/3] Analysing P/E ratios...")
+        history = load_history()
+        pe_analysis = analyse_pe(pe_data, history)
+        pe_analysis["note"] = rotation_note  # passed through to the notification
 
-    if pe_analysis["all"]:
-        print("\n  P/E leaderboard:")
-        for etf in pe_analysis["all"]:
-            marker = "▲" if etf["is_above"] else "▼"
-            print(f"    {etf['direction']} {marker}  {etf['name']:40s}  P/E {etf['pe_ratio']}")
+        # A snapshot re-run only reads the history — its values were already recorded
+        if not offline:
+            today = date.today().isoformat()
+            added = [record(history, t, d["pe_ratio"], today) for t, d in pe_data.items() if d]
+            if any(added):
+                save_history(history)
+
+        tracked = len(pe_analysis["all"])
+        skipped = len(pe_analysis["skipped"])
+        above = len(pe_analysis["above"])
+        below = len(pe_analysis["below"])
+        print(f"  Retrieved P/E for {tracked} ETFs ({skipped} skipped — no data available)")
+        print(f"  {above} expensive, {below} cheap, {tracked - above - below} within normal range")
+
+        if pe_analysis["all"]:
+            print("\n  P/E leaderboard:")
+            for etf in pe_analysis["all"]:
+                rank = "" if etf["percentile"] is None else f"  ({etf['percentile']:.0f}th pct)"
+                print(f"    {etf['direction']}  {etf['name']:40s}  P/E {etf['pe_ratio']}{rank}")
+
+        if not offline and any(pe_data.values()):
+            folder = write_snapshot("pe", pe_data, pe_analysis, {"note": rotation_note})
+            print(f"\n  Saved snapshot to {folder}")
 
     # Step 3: Send notification
-    print("\n[3/3] Sending P/E notification...")
-    send_pe_notification(pe_analysis)
+    with stage(profiling, "notify"):
+        print("\n[3/3] Sending P/E notification...")
+        sent = send_pe_notification(pe_analysis, dry_run=offline)
+
+    # Only a delivered report counts — after a crash or a failed send the
+    # next run reports this session again (from the same partials, if merging)
+    if sent:
+        last_seen["pe_session"] = session
+        save_last_seen(last_seen)
+        if args.merge is not None:
+            clear_partials("pe", args.merge)
 
     print("\nDone. ✅")
 
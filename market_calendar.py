@@ -0,0 +1,159 @@
+# =============================================================================
+# ETF TRACKER — US MARKET CALENDAR
+# =============================================================================
+# Works out, without any API calls, which US trading session has most
+# recently closed — so a run can tell straight away whether there is any new
+# data to fetch. Weekends and NYSE holidays are computed locally from their
+# rules (Good Friday from the date of Easter, Thanksgiving as the 4th
+# Thursday of November, and so on).
+#
+# Also keeps a small record in STATE_DIR of the newest bar already seen for
+# each ticker, so a run only fetches tickers that can have a new bar.
+#
+# One-off closures (e.g. a national day of mourning) can't be predicted from
+# rules — on those days the run simply fetches as normal.
+
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+from config import STATE_DIR
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_CLOSE = time(16, 0)  # regular session close, New York time
+
+LAST_SEEN_FILE = os.path.join(STATE_DIR, "last_seen.json")
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """The n-th given weekday of a month (Monday = 0). n = -1 means the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    """Easter Sunday (Gregorian calendar, anonymous algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(d: date) -> date:
+    """Fixed-date holidays falling on a weekend are observed on the nearest weekday."""
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+@lru_cache(maxsize=None)
+def nyse_holidays(year: int) -> frozenset:
+    """All full-day NYSE holidays in a year."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),            # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),            # Washington's Birthday
+        _easter(year) - timedelta(days=2),      # Good Friday
+        _nth_weekday(year, 5, 0, -1),           # Memorial Day
+        _observed(date(year, 7, 4)),            # Independence Day
+        _nth_weekday(year, 9, 0, 1),            # Labor Day
+        _nth_weekday(year, 11, 3, 4),           # Thanksgiving
+        _observed(date(year, 12, 25)),          # Christmas
+    }
+
+    # New Year's Day — when it falls on a Saturday the NYSE does not close
+    # on the Friday before (that would be the last trading day of the year)
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+
+    return frozenset(holidays)
+
+
+def is_trading_day(d: date) -> bool:
+    """True if the US market has a regular session on this date."""
+    return d.weekday() < 5 and d not in nyse_holidays(d.year)
+
+
+def previous_trading_day(d: date) -> date:
+    """The last trading day strictly before `d`."""
+    d -= timedelta(days=1)
+    while not is_trading_day(d):
+        d -= timedelta(days=1)
+    return d
+
+
+def latest_session(now: datetime = None) -> date:
+    """
+    The most recent trading day whose session has already closed — i.e. the
+    newest daily bar that can exist right now. Defaults to the current time.
+    """
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    today = now.date()
+    if is_trading_day(today) and now.time() >= MARKET_CLOSE:
+        return today
+    return previous_trading_day(today)
+
+
+# -----------------------------------------------------------------------------
+# Last-seen bars — newest bar date already reported, per ticker
+# -----------------------------------------------------------------------------
+
+def load_last_seen(path: str = LAST_SEEN_FILE) -> dict:
+    """
+    Loads the record of what previous runs already saw:
+    {
+        "bars":       {"VOO": "2025-03-14", ...},  # newest bar reported per ticker
+        "pe_session": "2025-03-14",                # session the last P/E run covered
+    }
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"bars": {}, "pe_session": None}
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Could not read {path} ({e}) — treating every ticker as new")
+        return {"bars": {}, "pe_session": None}
+
+
+def save_last_seen(last_seen: dict, path: str = LAST_SEEN_FILE):
+    """Writes the last-seen record back to disk."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(last_seen, f, indent=2)
+
+
+def tickers_needing_fetch(tickers, last_seen: dict, session: date) -> list:
+    """
+    Tickers whose newest reported bar isn't `session`. A recorded bar dated
+    after `session` can only have been an in-progress one, so it isn't
+    trusted and the ticker is fetched again.
+    """
+    cutoff = session.isoformat()
+    bars = last_seen.get("bars", {})
+    return [t for t in tickers if bars.get(t, "") != cutoff]
+
+
+if __name__ == "__main__":
+    # Quick test — this year's holidays and the current session
+    year = date.today().year
+    print(f"NYSE holidays {year}:")
+    for d in sorted(nyse_holidays(year)):
+        print(f"  {d}  {d.strftime('%A')}")
+    print("Latest closed session:", latest_session())
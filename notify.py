@@ -6,7 +6,25 @@
 
 import requests
 from datetime import date
-from config import NTFY_URL, ALERT_THRESHOLD_PCT, PE_ALERT_THRESHOLD, CRYPTO_ALERT_THRESHOLD_PCT
+from config import (
+    NTFY_URL,
+    ALERT_THRESHOLD_PCT,
+    PE_ALERT_THRESHOLD,
+    PE_PERCENTILE_HIGH,
+    PE_PERCENTILE_LOW,
+    CRYPTO_HORIZON_THRESHOLDS,
+)
+
+
+def _rule_lines(hits: list) -> list:
+    """Lines listing custom alert rule matches (see rules.py), or none if there aren't any."""
+    if not hits:
+        return []
+    lines = ["⚡ Rule matches:"]
+    for hit in hits:
+        values = ", ".join(f"{field} {value:g}" for field, value in hit["values"].items())
+        lines.append(f"   {hit['rule']} — {hit['name']} ({hit['ticker']}): {values}")
+    return lines + [""]
 
 
 def format_message(analysis: dict) -> tuple[str, str]:
@@ -27,31 +45,55 @@ def format_message(analysis: dict) -> tuple[str, str]:
         title_parts.append(f"{len(gains)} up")
     if losses:
         title_parts.append(f"{len(losses)} down")
+    hits = analysis.get("rule_hits", [])
+    if hits:
+        title_parts.append(f"{len(hits)} rule match{'es' if len(hits) > 1 else ''}")
 
     title = f"ETF Alert {today} - " + ", ".join(title_parts)
 
     # --- Body ---
-    lines = [f"Moves >= {ALERT_THRESHOLD_PCT}% detected:\n"]
+    threshold = analysis.get("threshold") or ALERT_THRESHOLD_PCT
+    lines = [f"Moves >= {threshold}% detected:\n"] if movers else []
 
-    for m in movers:
+    # Correlated movers (see correlate.py) share one line — the biggest move
+    # leads, the rest are listed underneath. Without clusters, one per line.
+    clusters = analysis.get("clusters") or [[m] for m in movers]
+
+    for cluster in clusters:
+        m = cluster[0]
         sign = "+" if m["pct_change"] > 0 else ""
-        lines.append(
+        line = (
             f"{m['direction']} {m['name']}\n"
             f"   {m['currency']} {m['prev_close']} → {m['last_close']} "
             f"({sign}{m['pct_change']}%)\n"
         )
+        if "local_currency" in m:
+            # Converted into home currency — also show the move in the ETF's own currency
+            line += f"   ({m['local_currency']} {m['local_pct_change']:+}%)\n"
+        if len(cluster) > 1:
+            others = ", ".join(
+                f"{o['ticker']} ({'+' if o['pct_change'] > 0 else ''}{o['pct_change']}%)"
+                for o in cluster[1:]
+            )
+            line += f"   + moved with it: {others}\n"
+        lines.append(line)
+
+    lines += _rule_lines(hits)
 
     body = "\n".join(lines)
     return title, body
 
 
-def send_notification(analysis: dict) -> bool:
+def send_notification(analysis: dict, dry_run: bool = False, url: str = NTFY_URL) -> bool:
     """
-    Sends a push notification to Ntfy if there are any movers.
+    Sends a push notification to Ntfy if there are any movers or rule matches.
+    `url` is the Ntfy topic to post to (defaults to NTFY_TOPIC's).
+    With dry_run=True the message is only previewed, never sent.
     Returns True if sent successfully, False otherwise.
     """
     if not analysis["has_alert"]:
-        print("No ETFs moved more than the threshold today. No notification sent.")
+        print("No ETFs moved more than the threshold and no rules matched today. "
+              "No notification sent.")
         return False
 
     title, body = format_message(analysis)
@@ -61,9 +103,13 @@ def send_notification(analysis: dict) -> bool:
     print(f"Body:\n{body}")
     print(f"----------------------------\n")
 
+    if dry_run:
+        print("Dry run — notification not sent.")
+        return False
+
     try:
         response = requests.post(
-            NTFY_URL,
+            url,
             data=body.encode("utf-8"),
             headers={
                 "Title": title,
@@ -73,7 +119,7 @@ def send_notification(analysis: dict) -> bool:
         )
 
         if response.ok:
-            print(f"✅ Notification sent successfully to {NTFY_URL}")
+            print(f"✅ Notification sent successfully to {url}")
             return True
         else:
             print(f"❌ Ntfy returned status {response.status_code}: {response.text}")
@@ -84,10 +130,20 @@ def send_notification(analysis: dict) -> bool:
         return False
 
 
-def send_pe_notification(pe_analysis: dict) -> bool:
+def _pe_line(m: dict) -> str:
+    """One line of the P/E report — shows the ETF's rank within its own history when known."""
+    if m["percentile"] is None:
+        return f"   {m['name']} ({m['ticker']}): {m['pe_ratio']}"
+    return f"   {m['name']} ({m['ticker']}): {m['pe_ratio']} — {m['percentile']:.0f}th pct of own history"
+
+
+def send_pe_notification(pe_analysis: dict, dry_run: bool = False) -> bool:
     """
     Sends a push notification with the daily P/E ratio status for all tracked ETFs.
-    ETFs above the threshold are flagged as expensive; below as potential buys.
+    ETFs in the top decile of their own P/E history are flagged as expensive, the
+    bottom decile as potential buys. ETFs without enough history yet fall back to
+    PE_ALERT_THRESHOLD.
+    With dry_run=True the message is only previewed, never sent.
     Returns True if sent successfully, False otherwise.
     """
     if not pe_analysis["has_alert"]:
@@ -97,29 +153,42 @@ def send_pe_notification(pe_analysis: dict) -> bool:
     today = date.today().strftime("%d %b %Y")
     above = pe_analysis["above"]
     below = pe_analysis["below"]
+    in_range = pe_analysis.get("in_range", [])
     skipped = pe_analysis["skipped"]
 
     # --- Title ---
     parts = []
     if above:
-        parts.append(f"{len(above)} above")
+        parts.append(f"{len(above)} expensive")
     if below:
-        parts.append(f"{len(below)} below")
-    title = f"P/E Alert {today} - " + ", ".join(parts) + f" ({PE_ALERT_THRESHOLD})"
+        parts.append(f"{len(below)} cheap")
+    if in_range:
+        parts.append(f"{len(in_range)} normal")
+    title = f"P/E Alert {today} - " + ", ".join(parts)
 
     # --- Body ---
-    lines = [f"P/E threshold: {PE_ALERT_THRESHOLD}\n"]
+    lines = [
+        f"Ranked against each ETF's own P/E history "
+        f"(top {100 - PE_PERCENTILE_HIGH}% / bottom {PE_PERCENTILE_LOW}%). "
+        f"ETFs with little history use the fixed threshold {PE_ALERT_THRESHOLD}.\n"
+    ]
 
     if above:
-        lines.append("🔴 Above threshold (expensive):")
+        lines.append("🔴 Expensive:")
         for m in above:
-            lines.append(f"   {m['name']} ({m['ticker']}): {m['pe_ratio']}")
+            lines.append(_pe_line(m))
         lines.append("")
 
     if below:
-        lines.append("🟢 Below threshold (potential buy):")
+        lines.append("🟢 Cheap (potential buy):")
         for m in below:
-            lines.append(f"   {m['name']} ({m['ticker']}): {m['pe_ratio']}")
+            lines.append(_pe_line(m))
+        lines.append("")
+
+    if in_range:
+        lines.append("🟡 Within normal range:")
+        for m in in_range:
+            lines.append(_pe_line(m))
         lines.append("")
 
     if skipped:
@@ -136,6 +205,10 @@ def send_pe_notification(pe_analysis: dict) -> bool:
     print(f"Body:\n{body}")
     print(f"--------------------------------\n")
 
+    if dry_run:
+        print("Dry run — notification not sent.")
+        return False
+
     try:
         response = requests.post(
             NTFY_URL,
@@ -159,38 +232,52 @@ def send_pe_notification(pe_analysis: dict) -> bool:
         return False
 
 
-def send_crypto_notification(analysis: dict) -> bool:
+def send_crypto_notification(analysis: dict, dry_run: bool = False) -> bool:
     """
-    Sends a push notification to Ntfy if any coins moved past the threshold.
+    Sends a push notification to Ntfy if any coins moved past the threshold
+    for any of the horizons in CRYPTO_HORIZON_THRESHOLDS, or matched a rule.
+    With dry_run=True the message is only previewed, never sent.
     Returns True if sent successfully, False otherwise.
     """
     if not analysis["has_alert"]:
-        print("No coins moved more than the threshold in the last 24h. No notification sent.")
+        print("No coins moved more than their thresholds and no rules matched. "
+              "No notification sent.")
         return False
 
     movers = analysis["movers"]
     today = date.today().strftime("%d %b %Y")
 
-    gains = [m for m in movers if m["pct_change"] > 0]
-    losses = [m for m in movers if m["pct_change"] < 0]
+    # Up/down follows each coin's lead move (the horizon furthest past its threshold)
+    gains = [m for m in movers if m["changes"][m["lead"]] > 0]
+    losses = [m for m in movers if m["changes"][m["lead"]] < 0]
 
     title_parts = []
     if gains:
         title_parts.append(f"{len(gains)} up")
     if losses:
         title_parts.append(f"{len(losses)} down")
+    hits = analysis.get("rule_hits", [])
+    if hits:
+        title_parts.append(f"{len(hits)} rule match{'es' if len(hits) > 1 else ''}")
 
     title = f"Crypto Alert {today} - " + ", ".join(title_parts)
 
-    lines = [f"24h moves >= {CRYPTO_ALERT_THRESHOLD_PCT}% detected:\n"]
+    limits = ", ".join(f"{h} {t}%" for h, t in CRYPTO_HORIZON_THRESHOLDS.items())
+    lines = [f"Moves past threshold detected ({limits}):\n"] if movers else []
     for m in movers:
-        sign = "+" if m["pct_change"] > 0 else ""
+        # Every horizon on one line — the ones that crossed their threshold are marked ⚠️
+        changes = " · ".join(
+            f"{h} {v:+.2f}%{' ⚠️' if h in m['triggers'] else ''}"
+            for h, v in m["changes"].items()
+        )
         lines.append(
             f"{m['direction']} {m['name']}\n"
-            f"   ${m['prev_close']:,.2f} → ${m['last_close']:,.2f} "
-            f"({sign}{m['pct_change']}%)\n"
+            f"   ${m['prev_close']:,.2f} → ${m['last_close']:,.2f} (24h)\n"
+            f"   {changes}\n"
         )
 
+    lines += _rule_lines(hits)
+
     body = "\n".join(lines)
 
     print(f"\n--- Crypto Notification Preview ---")
@@ -198,6 +285,10 @@ def send_crypto_notification(analysis: dict) -> bool:
     print(f"Body:\n{body}")
     print(f"-----------------------------------\n")
 
+    if dry_run:
+        print("Dry run — notification not sent.")
+        return False
+
     try:
         response = requests.post(
             NTFY_URL,
@@ -0,0 +1,110 @@
+# =============================================================================
+# ETF TRACKER — P/E HISTORY
+# =============================================================================
+# Keeps every P/E ratio we've fetched for each ETF, so today's value can be
+# ranked against that ETF's own normal range instead of one global threshold
+# (QQQ at 30 is ordinary; FXI at 30 would be extraordinary).
+#
+# Each ETF's history is stored as a sorted list, so ranking today's value is
+# a binary search (bisect) rather than a scan, and a new value is slotted in
+# at its sorted position. Saved to STATE_DIR between runs.
+
+import bisect
+import json
+import os
+from datetime import date
+from config import PE_HISTORY_FILE, PE_MIN_HISTORY
+
+HISTORY_FILE = PE_HISTORY_FILE
+
+
+def load_history(path: str = HISTORY_FILE) -> dict:
+    """
+    Loads the saved P/E history, or an empty one if there isn't any yet.
+
+    Returns a dict keyed by ticker:
+    {
+        "VOO": {
+            "values":    [19.8, 21.2, 24.6, ...],  # every P/E seen, sorted
+            "latest":    24.6,                     # most recent P/E
+            "last_date": "2025-03-14",             # date it was recorded
+        },
+        ...
+    }
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Could not read {path} ({e}) — starting P/E history from scratch")
+        return {}
+
+
+def save_history(history: dict, path: str = HISTORY_FILE):
+    """Writes the P/E history back to disk."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(history, f)
+
+
+def percentile(history: dict, ticker: str, pe: float, on_date: str = None):
+    """
+    Where `pe` sits within the ETF's own history, from 0 (lowest ever seen)
+    to 100 (highest ever seen). Ties count half below, half above.
+
+    `pe` is the value for `on_date` (default: today). If that day's value is
+    already in the history it's left out, so a value is always ranked
+    against every *other* day — the same answer before and after record().
+
+    Returns None if there are fewer than PE_MIN_HISTORY values to compare
+    against — too little history to say what "normal" is.
+    """
+    entry = history.get(ticker, {})
+    values = entry.get("values", [])
+    below = bisect.bisect_left(values, pe)
+    below_or_equal = bisect.bisect_right(values, pe)
+    count = len(values)
+
+    if entry.get("last_date") == (on_date or date.today().isoformat()):
+        recorded = entry["latest"]
+        count -= 1
+        if recorded < pe:
+            below -= 1
+            below_or_equal -= 1
+        elif recorded == pe:
+            below_or_equal -= 1
+
+    if count < PE_MIN_HISTORY:
+        return None
+    return round((below + below_or_equal) / 2 / count * 100, 1)
+
+
+def record(history: dict, ticker: str, pe: float, on_date: str) -> bool:
+    """
+    Adds today's P/E to the ETF's history, keeping the list sorted.
+    Only one value is kept per day, so a manual re-run doesn't count twice.
+
+    Returns True if the value was added.
+    """
+    entry = history.setdefault(ticker, {"values": [], "latest": None, "last_date": None})
+    if entry["last_date"] == on_date:
+        return False
+
+    bisect.insort(entry["values"], pe)
+    entry["latest"] = pe
+    entry["last_date"] = on_date
+    return True
+
+
+if __name__ == "__main__":
+    # Quick test with dummy data
+    history = {}
+    for day, pe in enumerate([18.0, 19.5, 21.0, 22.4, 20.1, 23.3, 24.0, 19.9, 21.7, 22.2, 20.5]):
+        record(history, "VOO", pe, f"2025-01-{day + 1:02d}")
+
+    print("VOO history:", history["VOO"]["values"])
+    for pe in (17.5, 21.0, 25.0):
+        print(f"P/E {pe} → percentile {percentile(history, 'VOO', pe)}")
+    print("QQQ (no history):", percentile(history, "QQQ", 30.0))
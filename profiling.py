@@ -0,0 +1,122 @@
+# =============================================================================
+# ETF TRACKER — RUN PROFILING
+# =============================================================================
+# When a run is slow, `--profile` shows where the time and memory went:
+#
+#   python main.py --profile
+#   python main_pe.py --profile
+#   python main_crypto.py --profile
+#
+# Each stage of the run (fetch, analyse, notify) is profiled separately and
+# saved under PROFILE_DIR/<pipeline>/<timestamp>/:
+#   1-fetch.pstats              — cProfile data: time per function, including
+#                                 time spent waiting on the network
+#   1-fetch-allocations.txt     — peak memory and the source lines that
+#                                 allocated the most
+#
+# Open a .pstats file with `python -m pstats 1-fetch.pstats` (then `sort
+# cumtime` and `stats 20`) or a viewer such as snakeviz.
+#
+# Without `--profile` nothing is imported or timed — each stage is wrapped
+# in a do-nothing context manager.
+
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from config import PROFILE_DIR, PROFILE_TOP_ALLOCATIONS
+
+
+def start_profiling(pipeline: str, enabled: bool = True):
+    """
+    Sets up a profiled run. Returns the run's profiling state, or None if
+    profiling is off — pass it to stage() either way.
+    """
+    if not enabled:
+        return None
+    folder = os.path.join(PROFILE_DIR, pipeline, datetime.now().strftime("%Y-%m-%dT%H%M%S"))
+    os.makedirs(folder, exist_ok=True)
+    print(f"  ⏱️  Profiling this run — results go to {folder}")
+    return {"folder": folder, "stages": 0}
+
+
+def stage(profiling, name: str):
+    """
+    Context manager wrapping one stage of a run:
+
+        with stage(profiling, "fetch"):
+            prices = fetch_prices()
+
+    Does nothing if profiling is None.
+    """
+    if profiling is None:
+        return nullcontext()
+    return _profiled_stage(profiling, name)
+
+
+@contextmanager
+def _profiled_stage(profiling: dict, name: str):
+    import cProfile
+    import tracemalloc
+
+    profiling["stages"] += 1
+    base = os.path.join(profiling["folder"], f"{profiling['stages']}-{name}")
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        allocations = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(base + ".pstats")
+        _write_allocations(base + "-allocations.txt", name, allocations, peak)
+        print(f"  ⏱️  {name}: {wall:.2f}s wall, {cpu:.2f}s CPU, "
+              f"peak memory {peak / 1e6:.1f} MB → {base}.pstats")
+
+
+def _write_allocations(path: str, name: str, allocations, peak: int):
+    """Writes the source lines still holding the most memory at the end of a stage."""
+    import tracemalloc
+
+    allocations = allocations.filter_traces([
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    top = allocations.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Stage: {name}\n")
+        f.write(f"Peak traced memory: {peak / 1e6:.2f} MB\n\n")
+        f.write(f"Top {len(top)} allocating lines (memory still held at the end of the stage):\n")
+        for stat in top:
+            frame = stat.traceback[0]
+            f.write(f"  {stat.size / 1024:10.1f} KiB  {stat.count:7d} blocks  "
+                    f"{frame.filename}:{frame.lineno}\n")
+
+
+if __name__ == "__main__":
+    # Quick test — profile two small stages into a temporary folder
+    import pstats
+    import tempfile
+
+    PROFILE_DIR = tempfile.mkdtemp()
+    profiling = start_profiling("demo")
+
+    with stage(profiling, "build"):
+        rows = [{"ticker": f"T{i}", "pct_change": (i % 17) - 8.0} for i in range(200_000)]
+    with stage(profiling, "sort"):
+        rows.sort(key=lambda r: abs(r["pct_change"]), reverse=True)
+
+    print()
+    pstats.Stats(os.path.join(profiling["folder"], "2-sort.pstats")).sort_stats("cumtime").print_stats(3)
+    with open(os.path.join(profiling["folder"], "1-build-allocations.txt"), encoding="utf-8") as f:
+        print(f.read())
@@ -0,0 +1,182 @@
+# =============================================================================
+# ETF TRACKER — DATA PROVIDERS AND FETCH PLANNER
+# =============================================================================
+# Every data source is declared once in PROVIDERS below: which kinds of data
+# it can supply ("price", "pe", "crypto"), how many symbols one request
+# covers, how fast it may be called, how many calls are left today and how
+# long a request typically takes.
+#
+# Each run asks for a set of (kind, symbol) pairs. plan() hands every pair to
+# the provider that would finish it soonest given the work it already has —
+# within each provider's daily budget — and fetch() runs the providers
+# side by side, each at its own pace. Adding a faster (or extra) provider
+# for a kind therefore speeds up every pipeline that needs that kind,
+# without touching the fetchers or main scripts.
+#
+# A provider's fetch functions are named as "module:function" and only
+# imported when the provider is actually used, so a run that needs no P/E
+# ratios never loads yfinance/pandas.
+
+import importlib
+import math
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    ALPHA_VANTAGE_KEYS,
+    ALPHA_VANTAGE_SECONDS_BETWEEN_CALLS,
+    YAHOO_SECONDS_BETWEEN_CALLS,
+    COINGECKO_SECONDS_BETWEEN_CALLS,
+)
+
+
+def _alpha_vantage_budget():
+    from key_pool import load_pool, remaining
+    return remaining(load_pool())
+
+
+PROVIDERS = {
+    "alpha_vantage": {
+        "kinds": {"price": "fetch_prices:fetch_alpha_vantage"},
+        "batch_size": 1,
+        # Each key is paced separately (see key_pool.py), so more keys = faster
+        "calls_per_minute": 60 / ALPHA_VANTAGE_SECONDS_BETWEEN_CALLS * len(ALPHA_VANTAGE_KEYS),
+        "daily_budget": _alpha_vantage_budget,   # None = no daily limit
+        "latency": 0.8,                          # typical seconds per request
+    },
+    "yahoo": {
+        "kinds": {"pe": "fetch_pe:fetch_yahoo_pe"},
+        "batch_size": 1,
+        "calls_per_minute": 60 / YAHOO_SECONDS_BETWEEN_CALLS,
+        "daily_budget": None,
+        "latency": 1.5,
+    },
+    "coingecko": {
+        "kinds": {"crypto": "fetch_crypto_prices:fetch_coingecko"},
+        "batch_size": 250,
+        "calls_per_minute": 60 / COINGECKO_SECONDS_BETWEEN_CALLS,
+        "daily_budget": None,
+        "latency": 1.0,
+    },
+}
+
+
+def estimate_seconds(provider: dict, symbols: int) -> float:
+    """Roughly how long a provider takes to fetch this many symbols."""
+    calls = math.ceil(symbols / provider["batch_size"])
+    if not calls:
+        return 0.0
+    # Calls go out one after another, no closer together than the rate limit allows
+    spacing = max(provider["latency"], 60 / provider["calls_per_minute"])
+    return (calls - 1) * spacing + provider["latency"]
+
+
+def plan(needed: dict, providers: dict = PROVIDERS) -> dict:
+    """
+    Splits the symbols needed for each kind of data across providers.
+
+    `needed` is {kind: [symbol, ...]}. Returns:
+    {
+        "assignments": {"alpha_vantage": {"price": ["VOO", ...]}, ...},
+        "unplanned":   {"price": ["XLE"]},      # no provider with budget left
+        "estimates":   {"alpha_vantage": 312.8}, # seconds, per provider
+    }
+    Each symbol goes to the provider that would finish soonest with it added
+    (earliest finish first), so the slowest provider finishes as early as
+    possible. A provider is never given more calls than its budget allows.
+    """
+    budgets = {}
+    for name, provider in providers.items():
+        budget = provider["daily_budget"]
+        budgets[name] = math.inf if budget is None else budget() if callable(budget) else budget
+
+    load = dict.fromkeys(providers, 0)
+    assignments, unplanned = {}, {}
+
+    for kind, symbols in needed.items():
+        candidates = [name for name, p in providers.items() if kind in p["kinds"]]
+        for symbol in symbols:
+            best, best_finish = None, math.inf
+            for name in candidates:
+                provider = providers[name]
+                if math.ceil((load[name] + 1) / provider["batch_size"]) > budgets[name]:
+                    continue
+                finish = estimate_seconds(provider, load[name] + 1)
+                if finish < best_finish:
+                    best, best_finish = name, finish
+            if best is None:
+                unplanned.setdefault(kind, []).append(symbol)
+                continue
+            load[best] += 1
+            assignments.setdefault(best, {}).setdefault(kind, []).append(symbol)
+
+    estimates = {name: estimate_seconds(providers[name], load[name]) for name in assignments}
+    return {"assignments": assignments, "unplanned": unplanned, "estimates": estimates}
+
+
+def _resolve(target: str):
+    module, function = target.split(":")
+    return getattr(importlib.import_module(module), function)
+
+
+def _run_provider(name: str, work: dict, providers: dict) -> dict:
+    """Fetches one provider's share of the plan. Returns {kind: {symbol: record}}."""
+    results = {}
+    for kind, symbols in work.items():
+        try:
+            results[kind] = _resolve(providers[name]["kinds"][kind])(symbols)
+        except Exception as e:
+            print(f"  ❌  {name}: {kind} fetch failed — {e}")
+            results[kind] = dict.fromkeys(symbols)
+    return results
+
+
+def fetch(needed: dict, providers: dict = PROVIDERS) -> dict:
+    """
+    Fetches every (kind, symbol) pair in `needed` ({kind: [symbol, ...]})
+    using the plan from plan(), with each provider working in parallel.
+
+    Returns {kind: {symbol: record}}, with None for any symbol that couldn't
+    be fetched (including ones no provider had budget left for).
+    """
+    fetch_plan = plan(needed, providers)
+    for name, work in fetch_plan["assignments"].items():
+        counts = ", ".join(f"{len(s)} {kind}" for kind, s in work.items())
+        print(f"  Plan: {name} → {counts} (~{fetch_plan['estimates'][name]:.0f}s)")
+
+    results = {kind: {} for kind in needed}
+    for kind, symbols in fetch_plan["unplanned"].items():
+        print(f"  ❌  No {kind} provider has budget left today for: {', '.join(symbols)}")
+        results[kind].update(dict.fromkeys(symbols))
+
+    assignments = fetch_plan["assignments"]
+    if len(assignments) == 1:
+        # Nothing to overlap — run it here and keep tracebacks simple
+        outcomes = [_run_provider(*next(iter(assignments.items())), providers)]
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, len(assignments))) as pool:
+            outcomes = list(pool.map(lambda item: _run_provider(*item, providers), assignments.items()))
+
+    for outcome in outcomes:
+        for kind, records in outcome.items():
+            results[kind].update(records)
+
+    # Keep each kind in the order it was asked for
+    return {kind: {s: results[kind].get(s) for s in symbols} for kind, symbols in needed.items()}
+
+
+if __name__ == "__main__":
+    # Quick test — plan a big watchlist across Alpha Vantage plus a made-up
+    # faster price provider with a small daily budget
+    providers = dict(PROVIDERS)
+    providers["alpha_vantage"] = dict(PROVIDERS["alpha_vantage"], daily_budget=25)
+    providers["example_fast"] = {
+        "kinds": {"price": "example:fetch"},
+        "batch_size": 50,
+        "calls_per_minute": 30,
+        "daily_budget": 2,
+        "latency": 2.0,
+    }
+    needed = {"price": [f"T{i:03d}" for i in range(150)], "crypto": ["bitcoin", "ethereum"]}
+    result = plan(needed, providers)
+    for name, work in result["assignments"].items():
+        print(name, {k: len(v) for k, v in work.items()}, f"~{result['estimates'][name]:.0f}s")
+    print("Unplanned:", {k: len(v) for k, v in result["unplanned"].items()})
@@ -0,0 +1,214 @@
+# =============================================================================
+# ETF TRACKER — ALERT RULES
+# =============================================================================
+# Lets you write your own alert conditions in config.py (ALERT_RULES) that
+# combine price moves, P/E ratios and crypto changes, e.g.
+#
+#   "Value dip": "pct_change <= -3 and pe_ratio < 20"
+#
+# Rules are ordinary comparisons joined with and / or / not. Only the field
+# names listed in FIELDS, numbers, strings, + - * /, and abs() are allowed —
+# anything else is rejected when the rules are compiled.
+#
+# All rules are compiled together, once, into a single expression that
+# returns every rule's result at the same time. Evaluating them is then one
+# pass over the table of symbols, however many rules there are. A rule that
+# fails on some row (e.g. dividing by a move of exactly 0) just doesn't
+# match that row — the other rules and rows are unaffected.
+
+import ast
+from config import CRYPTO_HORIZON_THRESHOLDS
+from pe_history import percentile
+
+# Field name -> what it means. Every row has all of these; a field that
+# doesn't apply to a symbol (e.g. pe_ratio for a coin) is None, and any rule
+# that uses it simply doesn't match that symbol.
+FIELDS = {
+    "ticker":           "ticker or CoinGecko id, e.g. \"VOO\" or \"bitcoin\"",
+    "pct_change":       "today's % move (ETFs: in HOME_CURRENCY; crypto: 24h)",
+    "local_pct_change": "ETF % move in its own currency (USD)",
+    "last_close":       "latest price",
+    "pe_ratio":         "ETF's latest P/E ratio from the P/E tracker",
+    "pe_percentile":    "where that P/E sits in the ETF's own history (0–100)",
+    "volume_24h":       "crypto 24h trading volume, USD",
+}
+for _horizon in CRYPTO_HORIZON_THRESHOLDS:
+    FIELDS[f"change_{_horizon}"] = f"crypto % change over {_horizon}"
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div,
+    ast.Compare, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq, ast.In, ast.NotIn,
+    ast.Name, ast.Load, ast.Constant, ast.Tuple, ast.List, ast.Call,
+)
+_FUNCTIONS = {"abs": abs}
+
+
+def _parse_rule(name: str, text: str):
+    """Parses one rule and checks it only uses allowed syntax and field names."""
+    try:
+        tree = ast.parse(text, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Alert rule {name!r} is not valid: {e.msg} in {text!r}") from None
+
+    fields = []
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Alert rule {name!r} uses unsupported syntax "
+                             f"({type(node).__name__}) in {text!r}")
+        if isinstance(node, ast.Call):
+            if not (isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS) or node.keywords:
+                raise ValueError(f"Alert rule {name!r}: only {', '.join(_FUNCTIONS)}() can be called")
+        elif isinstance(node, ast.Name) and node.id not in _FUNCTIONS:
+            if node.id not in FIELDS:
+                raise ValueError(f"Alert rule {name!r}: unknown field {node.id!r} "
+                                 f"(available: {', '.join(FIELDS)})")
+            if node.id not in fields:
+                fields.append(node.id)
+
+    return tree.body, fields
+
+
+def compile_rules(rules: dict) -> dict:
+    """
+    Compiles {rule name: rule text} into one code object that evaluates every
+    rule at once. Raises ValueError naming the rule if any rule is invalid.
+
+    Returns a dict:
+    {
+        "names":  ["Value dip", ...],
+        "fields": [["pct_change", "pe_ratio"], ...],   # fields each rule reads
+        "code":   <code object>,                       # every rule at once
+        "codes":  [<code object>, ...],                # each rule on its own
+    }
+    """
+    names, fields, parts, codes = [], [], [], []
+
+    for name, text in rules.items():
+        expr, used = _parse_rule(name, text)
+        # Guard each rule so it's only evaluated when all its fields are present:
+        #   (None not in (pct_change, pe_ratio)) and (<rule>)
+        if used:
+            guard = ast.Compare(
+                left=ast.Constant(None),
+                ops=[ast.NotIn()],
+                comparators=[ast.Tuple([ast.Name(f, ast.Load()) for f in used], ast.Load())],
+            )
+            expr = ast.BoolOp(op=ast.And(), values=[guard, expr])
+        names.append(name)
+        fields.append(used)
+        parts.append(expr)
+        codes.append(compile(ast.fix_missing_locations(ast.Expression(expr)), f"<rule {name}>", "eval"))
+
+    tree = ast.Expression(ast.Tuple(parts, ast.Load()))
+    ast.fix_missing_locations(tree)
+    return {"names": names, "fields": fields, "code": compile(tree, "<ALERT_RULES>", "eval"),
+            "codes": codes}
+
+
+def _evaluate_each(compiled: dict, namespace: dict, values: dict, ticker: str) -> list:
+    """
+    Slow path for a row where the combined expression raised: runs the rules
+    one at a time, so only the rule that failed is treated as not matched.
+    """
+    results = []
+    for name, code in zip(compiled["names"], compiled["codes"]):
+        try:
+            results.append(eval(code, namespace, values))
+        except (ArithmeticError, TypeError) as e:
+            print(f"  ⚠️  Alert rule {name!r} failed for {ticker} ({type(e).__name__}: {e}) "
+                  f"— treating it as not matched")
+            results.append(False)
+    return results
+
+
+def evaluate(compiled: dict, rows: list) -> list:
+    """
+    Runs every compiled rule over every row in a single pass.
+
+    Returns a list of matches, in row order:
+    [{"rule": "Value dip", "ticker": "VOO", "name": "S&P 500",
+      "values": {"pct_change": -3.4, "pe_ratio": 18.2}}, ...]
+    """
+    if not compiled["names"]:
+        return []
+
+    namespace = {"__builtins__": {}, **_FUNCTIONS}
+    blank = dict.fromkeys(FIELDS)
+    hits = []
+
+    for row in rows:
+        values = {**blank, **{k: v for k, v in row.items() if k in blank}}
+        try:
+            results = eval(compiled["code"], namespace, values)
+        except (ArithmeticError, TypeError):
+            results = _evaluate_each(compiled, namespace, values, row["ticker"])
+        for name, used, matched in zip(compiled["names"], compiled["fields"], results):
+            if matched:
+                hits.append({
+                    "rule": name,
+                    "ticker": row["ticker"],
+                    "name": row.get("name", row["ticker"]),
+                    "values": {f: values[f] for f in used if f != "ticker"},
+                })
+
+    return hits
+
+
+# -----------------------------------------------------------------------------
+# Joined table — one row per symbol, from whichever pipelines have data
+# -----------------------------------------------------------------------------
+
+def build_table(price_analysis: dict = None, pe_history: dict = None,
+                crypto_analysis: dict = None) -> list:
+    """
+    Joins the ETF price analysis with each ETF's latest stored P/E ratio,
+    plus the crypto analysis, into one list of rows keyed by the FIELDS names.
+    """
+    rows = []
+    pe_history = pe_history or {}
+
+    for etf in (price_analysis or {}).get("all", []):
+        row = {k: etf.get(k) for k in ("ticker", "name", "pct_change", "local_pct_change", "last_close")}
+        entry = pe_history.get(etf["ticker"], {})
+        pe = entry.get("latest")
+        if pe is not None:
+            row["pe_ratio"] = pe
+            # Ranked the same way as the P/E report ranked it (see percentile)
+            row["pe_percentile"] = percentile(pe_history, etf["ticker"], pe, entry["last_date"])
+        rows.append(row)
+
+    for coin in (crypto_analysis or {}).get("all", []):
+        row = {k: coin.get(k) for k in ("ticker", "name", "pct_change", "last_close", "volume_24h")}
+        for horizon, change in coin.get("changes", {}).items():
+            row[f"change_{horizon}"] = change
+        rows.append(row)
+
+    return rows
+
+
+if __name__ == "__main__":
+    # Quick test with dummy data
+    compiled = compile_rules({
+        "Value dip":      "pct_change <= -3 and pe_ratio < 20",
+        "Cheap vs own":   "pe_percentile <= 10",
+        "Crypto crash":   "change_24h <= -8 or change_7d <= -20",
+        "Broad big move": "abs(pct_change) >= 6 and ticker in ('VOO', 'VT')",
+    })
+    analysis = {"all": [
+        {"ticker": "VOO", "name": "S&P 500", "pct_change": -6.2, "last_close": 480.0},
+        {"ticker": "VWO", "name": "Emerging Mkts", "pct_change": -3.4, "last_close": 40.1},
+        {"ticker": "TLT", "name": "Treasuries", "pct_change": 1.2, "last_close": 92.0},
+    ]}
+    history = {"VWO": {"values": [12.0, 12.5, 13.0, 14.0, 15.0, 16.0, 17.0, 18.0, 19.0, 20.0, 21.0],
+                       "latest": 12.5, "last_date": "2025-03-14"}}
+    crypto = {"all": [{"ticker": "solana", "name": "Solana", "pct_change": -9.1,
+                       "changes": {"1h": -1.0, "24h": -9.1, "7d": -15.0, "30d": -4.0}}]}
+
+    for hit in evaluate(compiled, build_table(analysis, history, crypto)):
+        print(f"{hit['rule']:15s} {hit['ticker']:8s} {hit['values']}")
+
+    try:
+        compile_rules({"Bad": "__import__('os').system('ls')"})
+    except ValueError as e:
+        print("Rejected:", e)
@@ -0,0 +1,148 @@
+# =============================================================================
+# ETF TRACKER — SHARDED RUNS
+# =============================================================================
+# Splits a big watchlist across several workers (local processes or separate
+# GitHub Actions runners) so the fetching happens in parallel:
+#
+#   python main.py --shard 1/3     # each worker fetches its share of tickers
+#   python main.py --shard 2/3     # and saves it as a partial result
+#   python main.py --shard 3/3
+#   python main.py --merge 3       # combine, analyse and notify once
+#
+# Tickers are assigned to shards by consistent hashing: each shard owns many
+# points on a hash ring and a ticker belongs to the shard owning the next
+# point after the ticker's own hash. A ticker's shard depends only on its
+# name and the number of shards — adding or removing other tickers never
+# moves it, and changing the number of shards moves only about 1/N of them.
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+from functools import lru_cache
+from config import SHARD_DIR, SHARD_RUN_ID
+
+POINTS_PER_SHARD = 64  # more points = more even split between shards
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "big")
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """
+    Parses "i/N" (1-based, e.g. "2/3") into (i, N). Used as an argparse type,
+    so an invalid value raises ArgumentTypeError with a message for the user.
+    """
+    try:
+        i, n = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like i/N (e.g. 2/3), got {text!r}") from None
+    if not 1 <= i <= n:
+        raise argparse.ArgumentTypeError(f"shard {i}/{n} is out of range — i must be between 1 and {n}")
+    return i, n
+
+
+def parse_shard_count(text: str) -> int:
+    """Parses --merge's N, the number of shards: a whole number of at least 1."""
+    try:
+        n = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"number of shards must be a whole number, got {text!r}") from None
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"number of shards must be at least 1, got {n}")
+    return n
+
+
+@lru_cache(maxsize=None)
+def _ring(n: int) -> tuple[list, list]:
+    """The hash ring for N shards: sorted point hashes and the shard owning each."""
+    points = sorted(
+        (_hash(f"shard-{shard}-{point}"), shard)
+        for shard in range(1, n + 1)
+        for point in range(POINTS_PER_SHARD)
+    )
+    return [h for h, _ in points], [s for _, s in points]
+
+
+def shard_of(ticker: str, n: int) -> int:
+    """Which of N shards (1-based) a ticker belongs to."""
+    hashes, owners = _ring(n)
+    i = bisect.bisect(hashes, _hash(ticker)) % len(hashes)
+    return owners[i]
+
+
+def select(tickers, i: int, n: int) -> list:
+    """The tickers that belong to shard i of N, in their original order."""
+    return [t for t in tickers if shard_of(t, n) == i]
+
+
+def _partial_path(pipeline: str, i: int, n: int) -> str:
+    return os.path.join(SHARD_DIR, pipeline, f"{i}-of-{n}.json")
+
+
+def run_id(session) -> str:
+    """The ID tying workers and merge step together: SHARD_RUN_ID, else the session."""
+    return SHARD_RUN_ID or str(session)
+
+
+def write_partial(pipeline: str, i: int, n: int, run: str, data: dict, extra: dict = None) -> str:
+    """Saves one worker's fetched data for run `run`'s merge step. Returns the file path."""
+    path = _partial_path(pipeline, i, n)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"shard": i, "of": n, "run": run, "data": data, "extra": extra or {}}, f)
+    return path
+
+
+def merge_partials(pipeline: str, n: int, run: str) -> tuple[dict, list]:
+    """
+    Combines the partial results the N workers of run `run` saved.
+
+    Returns a tuple of:
+      - dict: every worker's fetched data merged together
+      - list: each worker's `extra` run context, in shard order
+    A missing partial (a worker that failed), or one left over from another
+    run, is reported and skipped, so the rest of the watchlist is still
+    analysed without mixing in stale data.
+    """
+    data, extras = {}, []
+    for i in range(1, n + 1):
+        path = _partial_path(pipeline, i, n)
+        try:
+            with open(path, encoding="utf-8") as f:
+                partial = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"  ⚠️  Shard {i}/{n}: no usable partial result ({e}) — its tickers are missing")
+            continue
+        if partial.get("run") != run:
+            print(f"  ⚠️  Shard {i}/{n}: partial result is from another run "
+                  f"({partial.get('run')}, expected {run}) — its tickers are missing")
+            continue
+        data.update(partial["data"])
+        extras.append(partial["extra"])
+        print(f"  ✅  Shard {i}/{n}: {len(partial['data'])} result(s)")
+    return data, extras
+
+
+def clear_partials(pipeline: str, n: int):
+    """Removes the N workers' partial results once they've been merged and reported."""
+    for i in range(1, n + 1):
+        try:
+            os.remove(_partial_path(pipeline, i, n))
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == "__main__":
+    # Quick test — how a watchlist splits, and how little moves when it changes
+    from config import WATCHLIST
+
+    tickers = list(WATCHLIST)
+    for n in (3, 4):
+        print(f"{n} shards:", {i: len(select(tickers, i, n)) for i in range(1, n + 1)})
+
+    before = {t: shard_of(t, 3) for t in tickers}
+    moved = [t for t in tickers if shard_of(t, 4) != before[t]]
+    print(f"Going from 3 to 4 shards moves {len(moved)} of {len(tickers)} tickers")
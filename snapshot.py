@@ -0,0 +1,188 @@
+# =============================================================================
+# ETF TRACKER — RUN SNAPSHOTS
+# =============================================================================
+# Every run saves what it fetched (and what it worked out from it) to a small
+# snapshot folder, so a report can be regenerated or debugged later without
+# making any network calls:
+#
+#   python main.py --from-snapshot              # newest ETF snapshot
+#   python main.py --from-snapshot snapshots/etf/2025-03-14T170512
+#
+# A snapshot folder holds:
+#   index.json    — tickers, text fields (names, currencies, dates) and where
+#                   each numeric column starts in columns.bin
+#   columns.bin   — every numeric field as a packed float64 column, read back
+#                   through a memory map (no parsing, near-zero load time)
+#   analysis.json — the analysis that was sent in the notification
+#
+# Only the standard library is used (array + mmap), so nothing extra needs
+# installing on the runner.
+
+import json
+import math
+import mmap
+import os
+import shutil
+from array import array
+from datetime import datetime
+from config import SNAPSHOT_DIR, SNAPSHOT_KEEP
+
+INDEX_FILE = "index.json"
+COLUMNS_FILE = "columns.bin"
+ANALYSIS_FILE = "analysis.json"
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def write_snapshot(pipeline: str, data: dict, analysis: dict, extra: dict = None) -> str:
+    """
+    Saves one run's fetched data and analysis under SNAPSHOT_DIR/<pipeline>/.
+
+    `data` is what the fetcher returned — a dict of key -> record (or None
+    if that key failed to fetch). Numeric fields go into float64 columns;
+    everything else is kept in the index. `extra` is any other small bit of
+    run context to keep (e.g. the P/E rotation note).
+
+    Returns the snapshot folder path. Older snapshots beyond SNAPSHOT_KEEP
+    are removed. Callers skip runs that fetched nothing, so the newest
+    snapshot is always one worth replaying.
+    """
+    keys = list(data.keys())
+    records = [data[k] or {} for k in keys]
+    fields = sorted({f for r in records for f in r})
+
+    numeric = [f for f in fields
+               if all(_is_number(r[f]) for r in records if r.get(f) is not None)]
+    text = [f for f in fields if f not in numeric]
+
+    # One contiguous column per numeric field; NaN where the value is missing
+    columns = array("d")
+    offsets = {}
+    for f in numeric:
+        offsets[f] = len(columns)
+        columns.extend(
+            float(r[f]) if r.get(f) is not None else math.nan for r in records
+        )
+
+    index = {
+        "pipeline": pipeline,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "keys": keys,
+        "missing": [k for k in keys if data[k] is None],
+        "columns": offsets,
+        "text": {f: [r.get(f) for r in records] for f in text},
+        "extra": extra or {},
+    }
+
+    folder = _new_folder(pipeline)
+
+    with open(os.path.join(folder, COLUMNS_FILE), "wb") as f:
+        columns.tofile(f)
+    with open(os.path.join(folder, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    with open(os.path.join(folder, ANALYSIS_FILE), "w", encoding="utf-8") as f:
+        json.dump(analysis, f, ensure_ascii=False)
+
+    _prune(pipeline)
+    return folder
+
+
+def _new_folder(pipeline: str) -> str:
+    """
+    Creates a fresh snapshot folder named after the current time. Two runs
+    in the same second get "…T170512" and "…T170512-2", and so on — the
+    folder is claimed atomically, so concurrent runs never share one.
+    """
+    base = os.path.join(SNAPSHOT_DIR, pipeline, datetime.now().strftime("%Y-%m-%dT%H%M%S"))
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    folder, n = base, 1
+    while True:
+        try:
+            os.mkdir(folder)
+            return folder
+        except FileExistsError:
+            n += 1
+            folder = f"{base}-{n}"
+
+
+def _prune(pipeline: str):
+    """Keeps only the newest SNAPSHOT_KEEP snapshots for a pipeline."""
+    root = os.path.join(SNAPSHOT_DIR, pipeline)
+    for old in sorted(os.listdir(root))[:-SNAPSHOT_KEEP]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def latest_snapshot(pipeline: str):
+    """Returns the newest snapshot folder for a pipeline, or None if there isn't one."""
+    root = os.path.join(SNAPSHOT_DIR, pipeline)
+    if not os.path.isdir(root):
+        return None
+    runs = sorted(os.listdir(root))
+    return os.path.join(root, runs[-1]) if runs else None
+
+
+def resolve_snapshot(pipeline: str, path: str) -> str:
+    """
+    Turns a --from-snapshot argument into a snapshot folder. "latest" means
+    the newest snapshot for the pipeline. Exits with a message if not found.
+    """
+    folder = latest_snapshot(pipeline) if path == "latest" else path
+    if not folder or not os.path.isfile(os.path.join(folder, INDEX_FILE)):
+        raise SystemExit(f"❌ No {pipeline} snapshot found at {folder or os.path.join(SNAPSHOT_DIR, pipeline)}")
+    return folder
+
+
+def read_snapshot(folder: str) -> tuple[dict, dict]:
+    """
+    Loads a snapshot back into the same shape the fetcher originally returned.
+
+    Returns a tuple of:
+      - dict: key -> record (or None), exactly as passed to write_snapshot()
+      - dict: the `extra` run context
+    Whole numbers come back as floats (e.g. 100 → 100.0).
+    """
+    with open(os.path.join(folder, INDEX_FILE), encoding="utf-8") as f:
+        index = json.load(f)
+
+    keys = index["keys"]
+    n = len(keys)
+    missing = set(index["missing"])
+    data = {k: None if k in missing else {} for k in keys}
+
+    for field, values in index["text"].items():
+        for k, value in zip(keys, values):
+            if data[k] is not None and value is not None:
+                data[k][field] = value
+
+    path = os.path.join(folder, COLUMNS_FILE)
+    if index["columns"] and os.path.getsize(path):
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm).cast("d")
+            try:
+                for field, start in index["columns"].items():
+                    for k, value in zip(keys, view[start:start + n]):
+                        if data[k] is not None and not math.isnan(value):
+                            data[k][field] = value
+            finally:
+                view.release()
+
+    return data, index["extra"]
+
+
+if __name__ == "__main__":
+    # Quick round-trip test with dummy data
+    import tempfile
+    import snapshot
+
+    snapshot.SNAPSHOT_DIR = tempfile.mkdtemp()
+    dummy = {
+        "VDE": {"name": "Vanguard Energy", "prev_close": 100.0, "last_close": 104.5,
+                "currency": "USD", "date": "2025-03-14"},
+        "XBI": None,
+    }
+    folder = snapshot.write_snapshot("etf", dummy, {"has_alert": True}, {"note": "demo"})
+    print("Wrote:", folder, os.listdir(folder))
+    print("Read back:", snapshot.read_snapshot(folder))
+    shutil.rmtree(snapshot.SNAPSHOT_DIR)
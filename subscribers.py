@@ -0,0 +1,143 @@
+# =============================================================================
+# ETF TRACKER — SUBSCRIBER ROUTING
+# =============================================================================
+# Splits one run's price analysis into per-subscriber alerts (see SUBSCRIBERS
+# in config.py), then batches them so each Ntfy topic gets one message.
+#
+# Prices are fetched and analysed once for the union of all watchlists.
+# Routing then uses an inverted index (ticker -> subscribers watching it),
+# so each ETF is only checked against the people who actually watch it —
+# the work grows with the number of ETFs, not ETFs × subscribers.
+
+from config import SUBSCRIBERS, ALERT_THRESHOLD_PCT, ALERT_RULES, NTFY_SERVER
+
+
+def validate_subscribers(subscribers: list = SUBSCRIBERS) -> list:
+    """
+    Checks SUBSCRIBERS before anything is fetched, so a mistake in
+    SUBSCRIBERS_JSON stops the run straight away rather than after the
+    API budget has been spent. Fills in each subscriber's "name" (the topic)
+    if it's missing. Raises ValueError naming the bad entry.
+    """
+    if not isinstance(subscribers, list):
+        raise ValueError(f"SUBSCRIBERS_JSON must be a list of subscribers, got {type(subscribers).__name__}")
+
+    for i, subscriber in enumerate(subscribers, start=1):
+        if not isinstance(subscriber, dict):
+            raise ValueError(f"Subscriber {i} must be an object, got {subscriber!r}")
+        label = f"Subscriber {i} ({subscriber.get('name') or subscriber.get('topic') or 'unnamed'})"
+
+        topic = subscriber.get("topic")
+        if not isinstance(topic, str) or not topic:
+            raise ValueError(f"{label}: \"topic\" is missing — every subscriber needs an Ntfy topic")
+        subscriber.setdefault("name", topic)
+
+        if not isinstance(subscriber.get("watchlist", []), (list, dict)):
+            raise ValueError(f"{label}: \"watchlist\" must be a list of tickers or a dict of ticker: name")
+
+        threshold = subscriber.get("alert_threshold_pct", ALERT_THRESHOLD_PCT)
+        if not isinstance(threshold, (int, float)) or isinstance(threshold, bool):
+            raise ValueError(f"{label}: \"alert_threshold_pct\" must be a number, got {threshold!r}")
+
+        rules = subscriber.get("rules", [])
+        if not isinstance(rules, list):
+            raise ValueError(f"{label}: \"rules\" must be a list of rule names from ALERT_RULES")
+        unknown = [r for r in rules if r not in ALERT_RULES]
+        if unknown:
+            raise ValueError(f"{label}: unknown rule(s) {', '.join(map(repr, unknown))} "
+                             f"(available: {', '.join(ALERT_RULES) or 'none'})")
+
+    return subscribers
+
+
+def build_index(subscribers: list = SUBSCRIBERS) -> dict:
+    """Returns {ticker: [subscriber, ...]} for every ticker anyone watches."""
+    index = {}
+    for subscriber in subscribers:
+        for ticker in subscriber.get("watchlist", []):
+            index.setdefault(ticker, []).append(subscriber)
+    return index
+
+
+def route(analysis: dict, subscribers: list = SUBSCRIBERS) -> dict:
+    """
+    Works out what each Ntfy topic should be told about.
+
+    Takes the output of analyse() (with "rule_hits" from rules.py, if any)
+    and returns one analysis-shaped dict per topic:
+    {
+        "johns-etf-alerts-8472": {
+            "movers":      [...],       # ETFs past that topic's threshold, biggest first
+            "rule_hits":   [...],       # rule matches on ETFs the topic watches
+            "threshold":   3.0,         # lowest threshold of its subscribers
+            "subscribers": ["john"],
+            "has_alert":   True,
+        },
+        ...
+    }
+    Subscribers sharing a topic are merged into one message.
+    """
+    index = build_index(subscribers)
+    per_topic = {}
+
+    def topic_entry(subscriber):
+        entry = per_topic.setdefault(subscriber["topic"], {
+            "movers": [], "rule_hits": [], "threshold": None, "subscribers": [],
+            "_seen": set(),
+        })
+        if subscriber["name"] not in entry["subscribers"]:
+            entry["subscribers"].append(subscriber["name"])
+            threshold = subscriber.get("alert_threshold_pct", ALERT_THRESHOLD_PCT)
+            entry["threshold"] = threshold if entry["threshold"] is None else min(entry["threshold"], threshold)
+        return entry
+
+    for subscriber in subscribers:
+        topic_entry(subscriber)
+
+    # analysis["all"] is sorted biggest move first, so movers stay in that order
+    for etf in analysis["all"]:
+        for subscriber in index.get(etf["ticker"], []):
+            threshold = subscriber.get("alert_threshold_pct", ALERT_THRESHOLD_PCT)
+            entry = topic_entry(subscriber)
+            if abs(etf["pct_change"]) >= threshold and etf["ticker"] not in entry["_seen"]:
+                entry["_seen"].add(etf["ticker"])
+                entry["movers"].append(etf)
+
+    for hit in analysis.get("rule_hits", []):
+        for subscriber in index.get(hit["ticker"], []):
+            if hit["rule"] not in subscriber.get("rules", ALERT_RULES):
+                continue
+            entry = topic_entry(subscriber)
+            if hit not in entry["rule_hits"]:
+                entry["rule_hits"].append(hit)
+
+    for entry in per_topic.values():
+        del entry["_seen"]
+        entry["has_alert"] = bool(entry["movers"] or entry["rule_hits"])
+
+    return per_topic
+
+
+def topic_url(topic: str) -> str:
+    """The Ntfy URL to post a topic's message to."""
+    return f"{NTFY_SERVER}/{topic}"
+
+
+if __name__ == "__main__":
+    # Quick test with dummy data
+    subscribers = [
+        {"name": "john", "topic": "john-alerts", "watchlist": ["VOO", "GLD"], "alert_threshold_pct": 3.0},
+        {"name": "sam",  "topic": "sam-alerts",  "watchlist": ["VOO", "VWO"]},
+        {"name": "kim",  "topic": "john-alerts", "watchlist": ["VWO"], "rules": []},
+    ]
+    analysis = {
+        "all": [
+            {"ticker": "VWO", "pct_change": -4.6},
+            {"ticker": "VOO", "pct_change": 3.4},
+            {"ticker": "GLD", "pct_change": 0.8},
+        ],
+        "rule_hits": [{"rule": "Value dip", "ticker": "VWO", "name": "VWO", "values": {}}],
+    }
+    for topic, entry in route(analysis, subscribers).items():
+        print(topic, entry["subscribers"], [m["ticker"] for m in entry["movers"]],
+              [h["rule"] for h in entry["rule_hits"]], "threshold", entry["threshold"])